@@ -1,119 +1,21 @@
 import customtkinter as ctk
-import pandas as pd
-import datasketch
-from datasketch import MinHash, MinHashLSHForest
 import threading
 import webbrowser
 import math
+import os
 import sys
 
-from six import StringIO
+# El motor de búsqueda es el del backend: índice desde el .ziphuff (o el
+# snapshot si ya existe) y las mismas consultas que la API.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from search_engine import build_index_on_startup, run_real_search
 
-from huffman import HuffmanCompressor
-
-NUM_PERMUTACIONES = 128
 RESULTS_PER_PAGE = 10
 
-COMPRESSED_FILENAME = "urls_new.ziphuff"
-
-# CORRECTO
-# 1. Crea una instancia de la clase
-compressor = HuffmanCompressor()
-
-# 2. Llama al método desde la instancia
-datos_descomprimidos = compressor.decompress_to_string(COMPRESSED_FILENAME)
-
-# 3. Usa los datos descomprimidos
-CSV_FILE = StringIO(datos_descomprimidos)
-# CSV_FILE = 'scanned_urls_202510192249.csv'
-
-forest = MinHashLSHForest(num_perm=NUM_PERMUTACIONES)
-data_store = {}
-
 results_data = []
 current_page = 0
 window = None
 
-def make_shingle(text: str):
-    if not text:
-        return set()
-    text = str(text).lower()
-    return set(text.split())
-
-def build_index_on_startup():
-    global forest, data_store
-    
-    print("--- [MOTOR] Iniciando ---")
-    print(f"Cargando CSV '{CSV_FILE}'...")
-    try:
-        df = pd.read_csv(CSV_FILE)
-        df.dropna(subset=['title'], inplace=True) 
-    except FileNotFoundError:
-        print("--- [ERROR FATAL] ---")
-        print(f"No se encontró el archivo '{CSV_FILE}'.")
-        print("Asegúrate de que el CSV esté en la misma carpeta.")
-        print("---------------------")
-        return False
-
-    print(f"Creando MinHashes para {len(df)} documentos...")
-    for index, row in df.iterrows():
-        csv_id = str(row['id'])
-        titulo = str(row['title'])
-        url = str(row['url'])
-        m = datasketch.MinHash(num_perm=NUM_PERMUTACIONES)
-        shingle = make_shingle(titulo)
-        if not shingle:
-            continue
-            
-        for s in shingle:
-            m.update(s.encode('utf-8'))
-            
-        data_store[csv_id] = {'title': titulo, 'url': url, 'minhash': m}
-
-    print(f"Poblando el índice LSHForest con {len(data_store)} elementos...")
-    for csv_id, data in data_store.items():
-        forest.add(csv_id, data['minhash'])
-
-    print("Finalizando índice (esto puede tardar un momento)...")
-    forest.index()
-    
-    print("--- [MOTOR] ¡Índice listo! ---")
-    return True
-
-def run_real_search(query):
-    global forest, data_store
-    
-    query_shingle = make_shingle(query)
-    if not query_shingle:
-        return []
-        
-    query_minhash = datasketch.MinHash(NUM_PERMUTACIONES)
-    for s in query_shingle:
-        query_minhash.update(s.encode('utf-8'))
-
-    result_keys = forest.query(query_minhash, k=100)
-
-    lista_resultados = []
-    for csv_id_key in result_keys:
-        item_similar = data_store.get(csv_id_key)
-        if not item_similar:
-            continue
-
-        minhash_similar = item_similar['minhash']
-        sim = query_minhash.jaccard(minhash_similar)
-        
-        if sim > 0.01:
-            lista_resultados.append({
-                'id': csv_id_key,
-                'title': item_similar['title'],
-                'url': item_similar['url'],
-                'similarity': sim
-            })
-    
-    lista_resultados.sort(key=lambda x: x['similarity'], reverse=True)
-    
-    return lista_resultados
-
 def run_search_thread(query):
     print(f"Buscando en el índice: '{query}'")
     results = run_real_search(query)
@@ -140,6 +42,7 @@ def show_page(page_index):
         title = item.get('title', 'Sin Título')
         url = item.get('url', '')
         sim = item.get('similarity', 0)
+        duplicados = item.get('duplicates', [])
         title_label = ctk.CTkLabel(
             results_frame,
             text=f"[{sim*100:.1f}%] {title}",
@@ -149,7 +52,7 @@ def show_page(page_index):
         title_label.bind("<Button-1>", lambda e, u=url: open_link(u))
         title_label.pack(anchor="w", padx=10, pady=(5, 0))
         url_label = ctk.CTkLabel(
-            results_frame, text=url,
+            results_frame, text=url + (f"  (+{len(duplicados)} similares)" if duplicados else ""),
             font=ctk.CTkFont(size=12), text_color="gray60"
         )
         url_label.pack(anchor="w", padx=10, pady=(0, 10))
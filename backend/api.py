@@ -1,8 +1,17 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Form
+from fastapi import Depends, FastAPI, Form, Header, HTTPException
+from pydantic import BaseModel
 from search_engine import build_index_on_startup
 from search_engine import run_real_search
+from search_engine import search_cache_stats
+from search_engine import add_documents, delete_documents, index_stats, start_background_merge
 import asyncio
+import os
+import secrets
+
+# Token que deben enviar (cabecera X-API-Key) los endpoints que modifican el
+# índice. Sin él esos endpoints quedan deshabilitados.
+ADMIN_TOKEN = os.environ.get('SEARCH_ADMIN_TOKEN')
 
 index_ready = asyncio.Event()
 
@@ -36,4 +45,41 @@ async def search(search_content: str = Form(...)):
 
     print(search_content)
 
-    return run_real_search(search_content)
\ No newline at end of file
+    return run_real_search(search_content)
+
+@app.get('/search/cache/')
+def cache_stats():
+    return search_cache_stats()
+
+
+class Documento(BaseModel):
+    id: str
+    title: str
+    url: str
+
+
+def require_admin(x_api_key: str = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=503, detail='Las actualizaciones del índice están deshabilitadas.')
+    if x_api_key is None or not secrets.compare_digest(x_api_key, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail='API key inválida.')
+    if not index_ready.is_set():
+        raise HTTPException(status_code=503, detail='El motor esta inicializandose...')
+
+@app.get('/index/')
+def index_status():
+    return index_stats()
+
+@app.post('/documents/', dependencies=[Depends(require_admin)])
+def upsert_documents(documentos: list[Documento]):
+    indexados = add_documents((doc.id, doc.title, doc.url) for doc in documentos)
+    return {'indexed': indexados, **index_stats()}
+
+@app.delete('/documents/{doc_id}', dependencies=[Depends(require_admin)])
+def remove_document(doc_id: str):
+    delete_documents([doc_id])
+    return index_stats()
+
+@app.post('/index/merge/', dependencies=[Depends(require_admin)])
+def merge_index():
+    return {'started': start_background_merge(), **index_stats()}
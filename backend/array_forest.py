@@ -0,0 +1,124 @@
+import numpy as np
+
+# Mismos parámetros por defecto que datasketch.MinHashLSHForest.
+NUM_ARBOLES = 8
+# Bits por hash que pueden guardar las claves: 32 son los hashes completos;
+# con 16 las claves ocupan la mitad y dos hashes distintos coinciden con
+# probabilidad 2^-16, así que un prefijo de r hashes casi nunca coincide por
+# azar, pero las firmas ya no se pueden reconstruir desde el forest.
+TIPOS_CLAVE = {32: np.uint32, 16: np.uint16}
+
+
+class ArrayForest:
+    # LSH Forest en arrays, con la misma semántica que MinHashLSHForest: el
+    # árbol i indexa el tramo [i * k, (i + 1) * k) de cada firma. Por árbol
+    # se guardan sus claves distintas ordenadas, como matriz (k, n) con una
+    # fila por posición de hash para buscar columna a columna sobre memoria
+    # contigua, y en formato CSR las filas de cada clave en orden creciente
+    # (el orden en que MinHashLSHForest las habría añadido).
+
+    def __init__(self, arrays, l, k):
+        self.arrays = arrays
+        self.claves = arrays['claves']
+        self.inicio_arboles = arrays['inicio_arboles']
+        self.inicio_postings = arrays['inicio_postings']
+        self.postings = arrays['postings']
+        self.l = l
+        self.k = k
+        self.bits = self.claves.dtype.itemsize * 8
+
+    @classmethod
+    def from_signatures(cls, firmas, num_perm, l=NUM_ARBOLES, bits=32):
+        # Las claves se truncan antes de ordenarlas: el orden tiene que ser
+        # el de los valores que se guardan.
+        k = num_perm // l
+        firmas = np.asarray(firmas).reshape(-1, num_perm).astype(TIPOS_CLAVE[bits])
+        total = len(firmas)
+
+        claves = []
+        inicio_arboles = [0]
+        inicio_postings = []
+        postings = []
+        for arbol in range(l):
+            tramo = firmas[:, arbol * k:(arbol + 1) * k]
+            # lexsort ordena por la última clave primero y es estable: las
+            # filas con la misma clave quedan en orden creciente.
+            orden = np.lexsort(tramo.T[::-1])
+            ordenado = tramo[orden]
+            nuevas = np.ones(total, dtype=bool)
+            nuevas[1:] = (ordenado[1:] != ordenado[:-1]).any(axis=1)
+            inicios = np.flatnonzero(nuevas)
+
+            claves.append(ordenado[inicios])
+            inicio_arboles.append(inicio_arboles[-1] + len(inicios))
+            inicio_postings.append(arbol * total + inicios)
+            postings.append(orden)
+
+        inicio_postings.append([l * total])
+        return cls({
+            # Los hashes de MinHash son de 32 bits: uint32 no pierde nada.
+            'claves': np.ascontiguousarray(np.concatenate(claves).T),
+            'inicio_arboles': np.array(inicio_arboles, dtype=np.int64),
+            'inicio_postings': np.concatenate(inicio_postings).astype(np.int64),
+            'postings': np.concatenate(postings).astype(np.int32),
+        }, l, k)
+
+    def signatures(self):
+        # Firmas completas (n, l * k) reconstruidas desde los árboles: cada
+        # fila aparece una vez por árbol, bajo la clave de su tramo de firma.
+        # Sólo si las claves no están truncadas.
+        if self.bits < 32:
+            raise ValueError(f"Las claves del forest sólo guardan {self.bits} bits por hash.")
+        total = len(self.postings) // self.l
+        firmas = np.empty((total, self.l * self.k), dtype=self.claves.dtype)
+        for arbol in range(self.l):
+            bajo = int(self.inicio_arboles[arbol])
+            alto = int(self.inicio_arboles[arbol + 1])
+            limites = self.inicio_postings[bajo:alto + 1]
+            claves = np.repeat(np.arange(bajo, alto), np.diff(limites))
+            filas = self.postings[limites[0]:limites[-1]]
+            firmas[filas, arbol * self.k:(arbol + 1) * self.k] = self.claves[:, claves].T
+        return firmas
+
+    def _rangos(self, hashvalues):
+        # Para cada árbol y cada largo de prefijo r (1..k), el rango de claves
+        # ordenadas que comparten los primeros r hashes con la consulta. Cada
+        # rango se obtiene acotando el anterior con una búsqueda binaria.
+        rangos = []
+        for arbol in range(self.l):
+            bajo = int(self.inicio_arboles[arbol])
+            alto = int(self.inicio_arboles[arbol + 1])
+            consulta = hashvalues[arbol * self.k:(arbol + 1) * self.k]
+            por_prefijo = []
+            for columna in range(self.k):
+                valores = self.claves[columna, bajo:alto]
+                nuevo_bajo = bajo + int(np.searchsorted(valores, consulta[columna], 'left'))
+                alto = bajo + int(np.searchsorted(valores, consulta[columna], 'right'))
+                bajo = nuevo_bajo
+                por_prefijo.append((bajo, alto))
+            rangos.append(por_prefijo)
+        return rangos
+
+    def query(self, minhash, k):
+        # Mismo recorrido que MinHashLSHForest.query: de prefijos largos a
+        # cortos y, en cada uno, árbol por árbol hasta reunir k documentos.
+        if k <= 0:
+            raise ValueError("k must be positive")
+        # Se convierte al tipo de las claves (uint32, uint16 si están
+        # truncadas, o uint64 en snapshots anteriores) para que searchsorted
+        # no convierta los arrays enteros; la conversión deja los bits bajos.
+        rangos = self._rangos(np.asarray(minhash.hashvalues).astype(self.claves.dtype))
+
+        resultados = set()
+        for r in range(self.k, 0, -1):
+            for por_prefijo in rangos:
+                bajo, alto = por_prefijo[r - 1]
+                if bajo >= alto:
+                    continue
+                inicio = int(self.inicio_postings[bajo])
+                fin = int(self.inicio_postings[alto])
+                for fila in self.postings[inicio:fin].tolist():
+                    resultados.add(fila)
+                    if len(resultados) >= k:
+                        return list(resultados)
+        return list(resultados)
@@ -0,0 +1,99 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+from bench_search import crear_corpus, en_proceso_nuevo, leer_registros
+from process_memory import pico_rss_bytes
+
+CSV_FILE = '../scanned_urls_202510192249.csv'
+# Etapas de la construcción, en orden, como las anota _construir_desde_fuente.
+ETAPAS = ['lectura', 'tokens', 'firmas', 'duplicados', 'indice_invertido', 'almacen', 'forest']
+
+
+def construir(ruta_corpus, num_workers):
+    # Corre en un proceso nuevo: construcción completa del índice desde el
+    # CSV, como al arrancar el motor, con `num_workers` procesos.
+    import parallel_build
+    import search_engine
+
+    search_engine.BUILD_WORKERS = num_workers
+    # El benchmark mide el reparto en sí: sin el mínimo de filas por worker.
+    parallel_build.FILAS_MINIMAS_POR_WORKER = 1
+
+    tiempos = {}
+    inicio = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        _, store, _ = search_engine._construir_desde_fuente(ruta_corpus, tiempos)
+    return {
+        **{etapa + '_segundos': tiempos.get(etapa, 0.0) for etapa in ETAPAS},
+        'total_segundos': time.perf_counter() - inicio,
+        'documentos': len(store),
+        'representantes': store.representantes,
+        'rss_pico': pico_rss_bytes(),
+    }
+
+
+def medir(ruta_corpus, num_workers, repeticiones):
+    mejor = None
+    for _ in range(repeticiones):
+        tiempos = en_proceso_nuevo(construir, ruta_corpus, num_workers)
+        if mejor is None or tiempos['total_segundos'] < mejor['total_segundos']:
+            mejor = tiempos
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Escalado de la construcción del índice según procesos.")
+    parser.add_argument('--csv', default=CSV_FILE)
+    parser.add_argument('--escala', type=int, default=10,
+                        help="Tamaño del corpus en múltiplos del CSV (copias sintéticas, como bench_search.py).")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeticiones', type=int, default=1)
+    parser.add_argument('--salida', default='bench_build.json')
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix='bench_build_')
+    try:
+        ruta_corpus = crear_corpus(leer_registros(args.csv), args.escala, directorio)
+        print(f"Corpus x{args.escala} en '{ruta_corpus}', {os.cpu_count()} CPUs")
+
+        resultados = []
+        for num_workers in args.workers:
+            tiempos = medir(ruta_corpus, num_workers, args.repeticiones)
+            resultados.append({'workers': num_workers, **tiempos})
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    base = resultados[0]
+    for resultado in resultados:
+        resultado['aceleracion_tokens_firmas'] = ((base['tokens_segundos'] + base['firmas_segundos'])
+                                                  / (resultado['tokens_segundos'] + resultado['firmas_segundos']))
+        resultado['aceleracion_total'] = base['total_segundos'] / resultado['total_segundos']
+        etapas = "  ".join(f"{etapa} {resultado[etapa + '_segundos']:.2f}s" for etapa in ETAPAS)
+        print(f"{resultado['workers']:>3} workers  {etapas}  total {resultado['total_segundos']:7.2f}s "
+              f"(x{resultado['aceleracion_total']:.2f}, tokens+firmas x{resultado['aceleracion_tokens_firmas']:.2f})  "
+              f"RSS pico {resultado['rss_pico'] / 2**20:.0f} MiB")
+
+    informe = {
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'csv': os.path.abspath(args.csv),
+        'escala': args.escala,
+        'documentos': base['documentos'],
+        'resultados': resultados,
+    }
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=2)
+
+    print(f"Resultados guardados en '{args.salida}'")
+
+
+if __name__ == "__main__":
+    main()
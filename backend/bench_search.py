@@ -0,0 +1,288 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+from collections import Counter
+from itertools import accumulate
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from io import StringIO
+from multiprocessing import get_context
+
+import numpy as np
+
+from inverted_index import InvertedIndex
+from process_memory import pico_rss_bytes, rss_actual_bytes
+from tokenizer import make_shingle
+
+CSV_FILE = '../scanned_urls_202510192249.csv'
+ESCALAS = [1, 10, 100]
+PERMUTACIONES = [64, 128, 256]
+# Candidatos que se piden al forest por consulta (MAX_CANDIDATES).
+CANDIDATOS = [25, 50, 100, 200]
+# Bits por hash del almacén (SIGNATURE_BITS): 32 son las firmas completas.
+BITS = [32]
+# Umbrales de casi duplicados (DEDUP_THRESHOLD); 0 no agrupa.
+UMBRALES_DUPLICADOS = [0.8]
+NUM_CONSULTAS = 1000
+TOP = 10
+# En las copias sintéticas cada token se reemplaza con esta probabilidad por
+# otro del corpus: títulos parecidos pero no idénticos a los originales.
+PROBABILIDAD_REEMPLAZO = 0.3
+
+
+def leer_registros(ruta_csv):
+    with open(ruta_csv, 'r', encoding='utf-8', newline='') as f:
+        return [(fila['id'], fila['url'], fila['title']) for fila in csv.DictReader(f)]
+
+
+def crear_corpus(registros, escala, directorio):
+    # El CSV original más escala - 1 copias sintéticas, con otros ids y
+    # títulos perturbados con tokens tomados según su frecuencia en el corpus.
+    generador = random.Random(escala)
+    frecuencias = Counter(token for _, _, titulo in registros for token in titulo.split())
+    tokens = list(frecuencias)
+    acumuladas = list(accumulate(frecuencias.values()))
+
+    ruta = os.path.join(directorio, f"corpus_x{escala}.csv")
+    with open(ruta, 'w', encoding='utf-8', newline='') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(['id', 'url', 'title'])
+        escritor.writerows(registros)
+        for copia in range(1, escala):
+            for csv_id, url, titulo in registros:
+                palabras = [generador.choices(tokens, cum_weights=acumuladas)[0]
+                            if generador.random() < PROBABILIDAD_REEMPLAZO else palabra
+                            for palabra in titulo.split()]
+                escritor.writerow([f"{csv_id}-{copia}", f"{url}#{copia}", " ".join(palabras)])
+    return ruta
+
+
+def crear_consultas(registros, cantidad):
+    # Consultas realistas: de 1 a 8 palabras tomadas de un título del corpus,
+    # de modo que haya tanto consultas cortas (índice invertido) como largas
+    # (LSH Forest).
+    generador = random.Random(0)
+    titulos = [titulo for _, _, titulo in registros if make_shingle(titulo)]
+    consultas = []
+    while len(consultas) < cantidad:
+        palabras = sorted(make_shingle(generador.choice(titulos)))
+        generador.shuffle(palabras)
+        consultas.append(" ".join(palabras[:generador.randint(1, 8)]))
+    return consultas
+
+
+def verdad_de_referencia(ruta_corpus, consultas):
+    # Para cada consulta, cuántos documentos relevantes hay (hasta TOP) y el
+    # Jaccard exacto del TOP-ésimo, o None si ningún documento comparte
+    # tokens. Sale de un índice invertido sobre todos los títulos del corpus,
+    # no del índice del motor (que con casi duplicados agrupados sólo tiene
+    # a los representantes), así que es la misma para todas las
+    # configuraciones.
+    inverted = InvertedIndex.from_token_sets([make_shingle(titulo) for _, _, titulo in leer_registros(ruta_corpus)])
+    referencias = []
+    for consulta in consultas:
+        _, exactos = inverted.search(make_shingle(consulta))
+        exactos = exactos[exactos > 0]
+        if len(exactos) == 0:
+            referencias.append(None)
+            continue
+        relevantes = min(TOP, len(exactos))
+        umbral = np.partition(exactos, len(exactos) - relevantes)[len(exactos) - relevantes]
+        referencias.append((relevantes, float(umbral)))
+    return referencias
+
+
+def recall(resultados, tokens, referencia):
+    # Recall@TOP frente al Jaccard exacto sobre todo el corpus. Con empates
+    # en el puesto TOP cuenta como acierto cualquier documento tan similar
+    # como el TOP-ésimo. Los casi duplicados adjuntos a un resultado también
+    # cuentan como devueltos.
+    if referencia is None:
+        return None
+    relevantes, umbral = referencia
+
+    aciertos = 0
+    for resultado in resultados[:TOP]:
+        for devuelto in [resultado, *resultado['duplicates']]:
+            documento = make_shingle(devuelto['title'])
+            if len(tokens & documento) / len(tokens | documento) >= umbral:
+                aciertos += 1
+    return min(aciertos, relevantes) / relevantes
+
+
+def medir_configuracion(ruta_corpus, num_perm, bits, umbral_duplicados, candidatos, consultas, referencias):
+    # Corre en un proceso nuevo: construye el índice con el camino real de
+    # arranque (streaming del CSV, snapshot) y mide consultas sin caché.
+    import search_engine
+    from delta_segment import DeltaSegment
+    from query_cache import QueryCache
+
+    directorio = os.path.dirname(ruta_corpus)
+    search_engine.NUM_PERMUTACIONES = num_perm
+    search_engine.SIGNATURE_BITS = bits
+    search_engine.DEDUP_THRESHOLD = umbral_duplicados
+    search_engine.CSV_FILE = ruta_corpus
+    search_engine.COMPRESSED_FILENAME = ruta_corpus + ".no_existe"
+    search_engine.SNAPSHOT_FILE = os.path.join(directorio, f"indice_{num_perm}_{bits}_{umbral_duplicados}.snapshot")
+    search_engine.BUILD_IN_SUBPROCESS = False
+    search_engine.SNAPSHOT_RELOAD_INTERVAL = 0
+    search_engine.delta_segment = DeltaSegment(num_perm)
+    search_engine.query_cache = QueryCache(max_entries=0)
+    if os.path.exists(search_engine.SNAPSHOT_FILE):
+        os.remove(search_engine.SNAPSHOT_FILE)
+
+    rss_inicial = rss_actual_bytes()
+    inicio = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        if not search_engine.build_index_on_startup():
+            raise RuntimeError(f"No se pudo construir el índice de {ruta_corpus}")
+    construccion = time.perf_counter() - inicio
+    rss_indice = rss_actual_bytes()
+    rss_pico = pico_rss_bytes()
+
+    forest, data_store, inverted, _ = search_engine.indice_actual
+    bytes_firmas = data_store.arrays['firmas' if bits == 32 else 'firmas_bbit'].nbytes
+    bytes_indice = (data_store.nbytes() + sum(array.nbytes for array in forest.arrays.values())
+                    + sum(array.nbytes for array in inverted.arrays.values()))
+
+    filas = []
+    for maximo in candidatos:
+        search_engine.MAX_CANDIDATES = maximo
+        latencias = []
+        recalls = []
+        recalls_lsh = []
+        for consulta, referencia in zip(consultas, referencias):
+            inicio = time.perf_counter()
+            resultados = search_engine.run_real_search(consulta, TOP)
+            latencias.append(time.perf_counter() - inicio)
+
+            tokens = make_shingle(consulta)
+            valor = recall(resultados, tokens, referencia)
+            if valor is not None:
+                recalls.append(valor)
+                if len(tokens) > search_engine.SHORT_QUERY_TOKENS:
+                    recalls_lsh.append(valor)
+
+        latencias_ms = np.array(latencias) * 1000
+        filas.append({
+            'num_perm': num_perm,
+            'bits': bits,
+            'umbral_duplicados': umbral_duplicados,
+            'max_candidatos': maximo,
+            'documentos': len(data_store),
+            'representantes': data_store.representantes,
+            'construccion_segundos': construccion,
+            'bytes_firmas': bytes_firmas,
+            'bytes_indice': bytes_indice,
+            'rss_inicial': rss_inicial,
+            'rss_indice': rss_indice,
+            'rss_pico': rss_pico,
+            'consultas': len(consultas),
+            'latencia_p50_ms': float(np.percentile(latencias_ms, 50)),
+            'latencia_p95_ms': float(np.percentile(latencias_ms, 95)),
+            'latencia_p99_ms': float(np.percentile(latencias_ms, 99)),
+            'recall_at_10': float(np.mean(recalls)) if recalls else None,
+            'recall_at_10_lsh': float(np.mean(recalls_lsh)) if recalls_lsh else None,
+        })
+
+    # El snapshot, su lock y el registro de cambios compartido con el suyo.
+    for sufijo in ("", ".lock", ".delta", ".delta.lock"):
+        if os.path.exists(search_engine.SNAPSHOT_FILE + sufijo):
+            os.remove(search_engine.SNAPSHOT_FILE + sufijo)
+    return filas
+
+
+def en_proceso_nuevo(funcion, *argumentos):
+    # Cada construcción corre en un proceso recién creado para que el RSS sea
+    # sólo el suyo y no arrastre índices de mediciones anteriores.
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as ejecutor:
+        return ejecutor.submit(funcion, *argumentos).result()
+
+
+def ejecutar(ruta_csv, escalas, permutaciones, bits, umbrales_duplicados, candidatos, num_consultas, directorio):
+    registros = leer_registros(ruta_csv)
+    consultas = crear_consultas(registros, num_consultas)
+
+    resultados = []
+    for escala in escalas:
+        ruta = crear_corpus(registros, escala, directorio)
+        print(f"--- Escala x{escala}: {len(registros) * escala:,} documentos ---")
+        referencias = verdad_de_referencia(ruta, consultas)
+        for num_perm in permutaciones:
+            for b in bits:
+                for umbral in umbrales_duplicados:
+                    for fila in en_proceso_nuevo(medir_configuracion, ruta, num_perm, b, umbral, candidatos, consultas,
+                                                 referencias):
+                        fila['escala'] = escala
+                        resultados.append(fila)
+                        print(f"perm {num_perm:>4}  bits {b:>2}  dup {umbral:.2f}  k {fila['max_candidatos']:>4}  "
+                              f"build {fila['construccion_segundos']:7.2f}s  "
+                              f"indexados {fila['representantes']:,}  "
+                              f"firmas {fila['bytes_firmas'] / 2**20:6.1f} MiB  "
+                              f"índice {fila['bytes_indice'] / 2**20:6.1f} MiB  "
+                              f"RSS {fila['rss_indice'] / 2**20 if fila['rss_indice'] else 0:6.0f} MiB  "
+                              f"p50/p95/p99 {fila['latencia_p50_ms']:.2f}/{fila['latencia_p95_ms']:.2f}/"
+                              f"{fila['latencia_p99_ms']:.2f} ms  recall@10 {fila['recall_at_10']:.3f} "
+                              f"(LSH {fila['recall_at_10_lsh'] or 0:.3f})")
+        os.remove(ruta)
+
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark del motor de búsqueda: construcción, memoria, latencia y recall@10.")
+    parser.add_argument('--csv', default=CSV_FILE)
+    parser.add_argument('--escalas', type=int, nargs='+', default=ESCALAS,
+                        help="Tamaño del corpus en múltiplos del CSV (copias sintéticas).")
+    parser.add_argument('--permutaciones', type=int, nargs='+', default=PERMUTACIONES,
+                        help="Valores de NUM_PERMUTACIONES (múltiplos de 8).")
+    parser.add_argument('--bits', type=int, nargs='+', default=BITS, choices=[1, 2, 4, 8, 32],
+                        help="Valores de SIGNATURE_BITS, los bits por hash que guarda el almacén.")
+    parser.add_argument('--duplicados', type=float, nargs='+', default=UMBRALES_DUPLICADOS,
+                        help="Valores de DEDUP_THRESHOLD, el Jaccard a partir del cual se agrupan "
+                             "casi duplicados (0 no agrupa).")
+    parser.add_argument('--candidatos', type=int, nargs='+', default=CANDIDATOS,
+                        help="Valores de MAX_CANDIDATES, el k que se pide al forest.")
+    parser.add_argument('--consultas', type=int, default=NUM_CONSULTAS)
+    parser.add_argument('--directorio', default=None,
+                        help="Directorio para los corpus y snapshots (por defecto uno temporal).")
+    parser.add_argument('--salida', default='bench_search',
+                        help="Prefijo de los informes: se escriben <salida>.json y <salida>.csv.")
+    args = parser.parse_args()
+
+    directorio = args.directorio or tempfile.mkdtemp(prefix='bench_search_')
+    os.makedirs(directorio, exist_ok=True)
+    try:
+        resultados = ejecutar(args.csv, args.escalas, args.permutaciones, args.bits, args.duplicados,
+                              args.candidatos, args.consultas, directorio)
+    finally:
+        if args.directorio is None:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    informe = {
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'csv': os.path.abspath(args.csv),
+        'consultas': args.consultas,
+        'resultados': resultados,
+    }
+    with open(args.salida + '.json', 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=2)
+    with open(args.salida + '.csv', 'w', encoding='utf-8', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=['escala'] + [campo for campo in resultados[0] if campo != 'escala'])
+        escritor.writeheader()
+        escritor.writerows(resultados)
+
+    print(f"Resultados guardados en '{args.salida}.json' y '{args.salida}.csv'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import platform
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from sharded_engine import ShardedSearchEngine
+from tokenizer import make_shingle
+
+CSV_FILE = '../scanned_urls_202510192249.csv'
+LIMITE = 10
+
+
+def cargar_registros(ruta_csv, escala):
+    df = pd.read_csv(ruta_csv).dropna(subset=['title'])
+    registros = [(str(csv_id), str(titulo), str(url))
+                 for csv_id, titulo, url in zip(df['id'], df['title'], df['url'])
+                 if make_shingle(str(titulo))]
+    # Las copias llevan otro id para que se repartan entre los shards.
+    return [(f"{csv_id}#{copia}" if copia else csv_id, titulo, url)
+            for copia in range(escala) for csv_id, titulo, url in registros]
+
+
+def medir(motor, consultas, hilos, duracion):
+    # Consultas por segundo con `hilos` clientes concurrentes durante
+    # `duracion` segundos, y latencias de cada consulta.
+    limite_tiempo = time.perf_counter() + duracion
+    latencias = []
+
+    def cliente(semilla):
+        generador = random.Random(semilla)
+        propias = []
+        while time.perf_counter() < limite_tiempo:
+            inicio = time.perf_counter()
+            motor.search(generador.choice(consultas), LIMITE)
+            propias.append(time.perf_counter() - inicio)
+        return propias
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(hilos) as ejecutor:
+        for propias in ejecutor.map(cliente, range(hilos)):
+            latencias.extend(propias)
+    transcurrido = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        'consultas': len(latencias),
+        'qps': len(latencias) / transcurrido,
+        'p50_ms': latencias[len(latencias) // 2] * 1000,
+        'p99_ms': latencias[min(len(latencias) - 1, len(latencias) * 99 // 100)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas por segundo según la cantidad de shards.")
+    parser.add_argument('--csv', default=CSV_FILE)
+    parser.add_argument('--escala', type=int, default=1,
+                        help="Veces que se repiten los documentos del CSV.")
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--duracion', type=float, default=10.0)
+    parser.add_argument('--consultas', type=int, default=5000,
+                        help="Consultas distintas del corpus que se eligen al azar.")
+    parser.add_argument('--salida', default='bench_shards.json')
+    args = parser.parse_args()
+
+    registros = cargar_registros(args.csv, args.escala)
+    # Títulos del propio corpus como consultas, para que haya coincidencias.
+    consultas = [titulo for _, titulo, _ in random.Random(0).sample(registros, min(args.consultas, len(registros)))]
+    print(f"{len(registros):,} documentos, {os.cpu_count()} CPUs")
+    # Las consultas se repiten: con la caché de resultados de cada shard se
+    # mediría sobre todo la caché y no la búsqueda. Los shards heredan el
+    # entorno al arrancar.
+    os.environ['SEARCH_QUERY_CACHE_SIZE'] = '0'
+
+    resultados = []
+    for num_shards in args.shards:
+        motor = ShardedSearchEngine(num_shards)
+        try:
+            inicio = time.perf_counter()
+            motor.build(registros)
+            construccion = time.perf_counter() - inicio
+            motor.clear_cache()
+            metricas = medir(motor, consultas, args.hilos, args.duracion)
+        finally:
+            motor.close()
+        resultados.append({'shards': num_shards, 'construccion_segundos': construccion, **metricas})
+
+    base = resultados[0]['qps']
+    for resultado in resultados:
+        resultado['aceleracion'] = resultado['qps'] / base
+        print(f"{resultado['shards']:>3} shards: {resultado['qps']:8.1f} consultas/s  "
+              f"p50 {resultado['p50_ms']:6.2f} ms  p99 {resultado['p99_ms']:6.2f} ms  "
+              f"x{resultado['aceleracion']:.2f}")
+
+    with open(args.salida, 'w') as f:
+        json.dump({
+            'documentos': len(registros),
+            'cpus': os.cpu_count(),
+            'hilos': args.hilos,
+            'python': platform.python_version(),
+            'resultados': resultados,
+        }, f, indent=2)
+    print(f"Resultados en '{args.salida}'.")
+
+
+if __name__ == '__main__':
+    main()
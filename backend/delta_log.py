@@ -0,0 +1,102 @@
+import json
+import os
+
+from index_snapshot import snapshot_lock
+
+
+class DeltaLog:
+    # Registro de altas y bajas compartido por los workers que sirven el mismo
+    # snapshot: un archivo JSON lines al que sólo se agrega, bajo un flock.
+    # La primera línea es {"base": n}, la secuencia hasta la que los cambios
+    # ya están en el snapshot; cada una de las siguientes es
+    # [secuencia, id, título, url], con título y url None si es una baja.
+    # Cada worker lee desde donde se quedó y aplica los cambios a su propio
+    # segmento delta, así que todos ven todas las escrituras.
+
+    def __init__(self, ruta, secuencia=0):
+        self.ruta = ruta
+        # Última secuencia leída (o incorporada en el snapshot) y base del
+        # archivo actual.
+        self.secuencia = secuencia
+        self.base = 0
+        self._identidad = None
+        self._posicion = 0
+
+    def read(self):
+        # Cambios que otros procesos agregaron desde la última lectura, como
+        # (secuencia, id, título, url).
+        with snapshot_lock(self.ruta):
+            return self._leer()
+
+    def append(self, cambios):
+        # Agrega cambios (id, título, url) con secuencias nuevas. Devuelve
+        # todo lo que se agregó desde la última lectura, incluidos estos
+        # cambios, en el orden del registro.
+        with snapshot_lock(self.ruta):
+            entradas = self._leer()
+            lineas = []
+            for csv_id, titulo, url in cambios:
+                self.secuencia += 1
+                entradas.append((self.secuencia, csv_id, titulo, url))
+                lineas.append(json.dumps([self.secuencia, csv_id, titulo, url]) + "\n")
+            nuevo = self._identidad is None
+            with open(self.ruta, 'ab') as f:
+                if nuevo:
+                    self.base = self.secuencia - len(lineas)
+                    f.write((json.dumps({'base': self.base}) + "\n").encode('utf-8'))
+                f.write("".join(lineas).encode('utf-8'))
+                self._posicion = f.tell()
+                self._identidad = _identidad(os.fstat(f.fileno()))
+            return entradas
+
+    def compact(self, secuencia):
+        # Quita los cambios hasta `secuencia`, que ya están en el snapshot. Se
+        # llama después de escribir el snapshot: quien encuentre el archivo
+        # nuevo también encuentra un snapshot con esos cambios.
+        with snapshot_lock(self.ruta):
+            try:
+                with open(self.ruta, 'rb') as f:
+                    lineas = f.read().splitlines(keepends=True)[1:]
+            except FileNotFoundError:
+                return
+            restantes = [linea for linea in lineas if linea.endswith(b"\n") and json.loads(linea)[0] > secuencia]
+            ruta_temporal = f"{self.ruta}.{os.getpid()}.tmp"
+            with open(ruta_temporal, 'wb') as f:
+                f.write((json.dumps({'base': secuencia}) + "\n").encode('utf-8'))
+                f.writelines(restantes)
+            os.replace(ruta_temporal, self.ruta)
+
+    def _leer(self):
+        try:
+            f = open(self.ruta, 'rb')
+        except FileNotFoundError:
+            self._identidad = None
+            return []
+        with f:
+            identidad = _identidad(os.fstat(f.fileno()))
+            base = json.loads(f.readline())['base']
+            if identidad != self._identidad or base != self.base:
+                # Archivo nuevo (creado o compactado por otro proceso): se
+                # relee desde el principio salteando lo que ya se aplicó.
+                self._posicion = f.tell()
+            self._identidad, self.base = identidad, base
+            f.seek(self._posicion)
+            datos = f.read()
+
+        entradas = []
+        # Sólo líneas completas, por si un proceso se cayó a mitad de una
+        # escritura.
+        completas = datos[:datos.rfind(b"\n") + 1]
+        self._posicion += len(completas)
+        for linea in completas.splitlines():
+            secuencia, csv_id, titulo, url = json.loads(linea)
+            if secuencia > self.secuencia:
+                entradas.append((secuencia, csv_id, titulo, url))
+                self.secuencia = secuencia
+        self.secuencia = max(self.secuencia, self.base)
+        return entradas
+
+
+def _identidad(estado):
+    # Sin tamaño ni fecha: agregar líneas no cambia el archivo, compactarlo sí.
+    return estado.st_ino, estado.st_dev
@@ -0,0 +1,131 @@
+import threading
+
+import numpy as np
+
+from tokenizer import make_shingle
+
+
+class DeltaSegment:
+    # Cambios recientes sobre el índice principal, pendientes de fusionarse.
+    # Cada id guarda su último cambio como (secuencia, documento), donde el
+    # documento es (título, url, firma) o None si se borró. Un id presente
+    # aquí oculta su versión del índice principal; los documentos vivos se
+    # buscan por fuerza bruta, que es barato mientras el segmento sea chico.
+
+    def __init__(self, num_perm):
+        self.num_perm = num_perm
+        self._cambios = {}
+        self._secuencia = 0
+        # Secuencia hasta la que los cambios ya están en el índice principal.
+        self._fusionada = 0
+        self._lock = threading.Lock()
+        self._matriz = None
+
+    def __len__(self):
+        return len(self._cambios)
+
+    def upsert(self, documentos):
+        # documentos: iterable de (id, título, url, firma).
+        with self._lock:
+            for csv_id, titulo, url, firma in documentos:
+                self._secuencia += 1
+                firma = np.asarray(firma, dtype=np.uint32).reshape(self.num_perm)
+                self._cambios[csv_id] = (self._secuencia, (titulo, url, firma))
+            self._matriz = None
+
+    def delete(self, ids):
+        with self._lock:
+            for csv_id in ids:
+                self._secuencia += 1
+                self._cambios[csv_id] = (self._secuencia, None)
+            self._matriz = None
+
+    def apply(self, entradas):
+        # Cambios con la secuencia ya asignada por el registro compartido
+        # entre workers, como (secuencia, id, documento). Los que ya están en
+        # el índice principal se ignoran.
+        with self._lock:
+            for secuencia, csv_id, documento in entradas:
+                self._secuencia = max(self._secuencia, secuencia)
+                if secuencia <= self._fusionada:
+                    continue
+                if documento is not None:
+                    titulo, url, firma = documento
+                    documento = (titulo, url, np.asarray(firma, dtype=np.uint32).reshape(self.num_perm))
+                self._cambios[csv_id] = (secuencia, documento)
+            self._matriz = None
+
+    def hides(self, csv_id):
+        return csv_id in self._cambios
+
+    def view(self):
+        # Los ids ocultos y los documentos vivos de una misma versión del
+        # segmento, para que una consulta no mezcle dos versiones si llega una
+        # escritura mientras se arma la respuesta.
+        with self._lock:
+            return frozenset(self._cambios), self._armar_vivos()
+
+    def _documentos_vivos(self):
+        with self._lock:
+            return self._armar_vivos()
+
+    def _armar_vivos(self):
+        # Se arma una vez por versión del segmento: ids, títulos, urls, la
+        # matriz de firmas y los tokens de los documentos no borrados.
+        if self._matriz is None:
+            vivos = [(csv_id, doc) for csv_id, (_, doc) in self._cambios.items() if doc is not None]
+            firmas = np.array([doc[2] for _, doc in vivos], dtype=np.uint32).reshape(len(vivos), self.num_perm)
+            self._matriz = ([csv_id for csv_id, _ in vivos], [doc[0] for _, doc in vivos],
+                            [doc[1] for _, doc in vivos], firmas, [make_shingle(doc[0]) for _, doc in vivos])
+        return self._matriz
+
+    def search(self, hashvalues, umbral, vivos=None):
+        # Devuelve (ids, títulos, urls, similitudes) de los documentos vivos
+        # cuya similitud estimada con la firma supera el umbral. `vivos` es el
+        # segundo elemento de view(); por omisión, la versión actual.
+        ids, titulos, urls, firmas, _ = self._documentos_vivos() if vivos is None else vivos
+        if not ids:
+            return [], [], [], np.zeros(0)
+
+        firma = np.asarray(hashvalues, dtype=np.uint32)
+        similitudes = np.count_nonzero(firmas == firma, axis=1) / np.float64(self.num_perm)
+        return self._elegir(ids, titulos, urls, similitudes, umbral)
+
+    def search_tokens(self, tokens, umbral, vivos=None):
+        # Como search, pero con el Jaccard exacto contra los tokens de la
+        # consulta: el mismo que da el índice invertido a las consultas cortas.
+        ids, titulos, urls, _, conjuntos = self._documentos_vivos() if vivos is None else vivos
+        if not ids:
+            return [], [], [], np.zeros(0)
+
+        similitudes = np.array([len(tokens & conjunto) / len(tokens | conjunto) for conjunto in conjuntos])
+        return self._elegir(ids, titulos, urls, similitudes, umbral)
+
+    def _elegir(self, ids, titulos, urls, similitudes, umbral):
+        elegidos = np.flatnonzero(similitudes > umbral).tolist()
+        return ([ids[i] for i in elegidos], [titulos[i] for i in elegidos],
+                [urls[i] for i in elegidos], similitudes[elegidos])
+
+    def pending(self):
+        # Copia de los cambios para fusionarlos sin bloquear nuevas escrituras
+        # y la última secuencia que incluye.
+        with self._lock:
+            return dict(self._cambios), self._secuencia
+
+    def discard_merged(self, fusionados):
+        # Quita los cambios ya incorporados al índice principal, salvo los que
+        # se volvieron a modificar durante la fusión.
+        with self._lock:
+            for csv_id, (secuencia, _) in fusionados.items():
+                actual = self._cambios.get(csv_id)
+                if actual is not None and actual[0] == secuencia:
+                    del self._cambios[csv_id]
+            self._matriz = None
+
+    def discard_through(self, secuencia):
+        # Quita los cambios hasta `secuencia`, que ya están en el snapshot
+        # que se publicó, y descarta los que lleguen después con una anterior.
+        with self._lock:
+            self._fusionada = max(self._fusionada, secuencia)
+            self._cambios = {csv_id: cambio for csv_id, cambio in self._cambios.items() if cambio[0] > self._fusionada}
+            self._matriz = None
@@ -0,0 +1,147 @@
+import numpy as np
+from datasketch import MinHash
+
+from vocabulary import minhash_permutations
+
+# Columnas de texto del almacén; cada una es una arena UTF-8 con su array de
+# offsets (nombre + '_offsets').
+COLUMNAS_TEXTO = ('ids', 'titulos', 'urls')
+
+
+def _arena_de_textos(textos):
+    # Todos los textos en UTF-8 uno tras otro y un array de offsets (n + 1).
+    codificados = [texto.encode('utf-8') for texto in textos]
+    offsets = np.zeros(len(codificados) + 1, dtype=np.int64)
+    np.cumsum([len(texto) for texto in codificados], out=offsets[1:])
+    return np.frombuffer(b"".join(codificados), dtype=np.uint8), offsets
+
+
+# Bits por hash de las firmas completas. En modo compacto se guardan sólo
+# los b bits bajos de cada hash (b en BITS_COMPACTOS), 8 // b hashes por byte.
+BITS_COMPLETOS = 32
+BITS_COMPACTOS = (1, 2, 4, 8)
+
+
+def _iguales_por_byte(bits):
+    # Para cada valor de un byte (el XOR de dos bytes empaquetados), cuántos
+    # de sus grupos de `bits` bits son cero, es decir, hashes que coinciden.
+    mascara = (1 << bits) - 1
+    valores = np.arange(256)
+    return sum(((valores >> desplazamiento) & mascara) == 0
+               for desplazamiento in range(0, 8, bits)).astype(np.int64)
+
+
+_IGUALES_POR_BYTE = {bits: _iguales_por_byte(bits) for bits in BITS_COMPACTOS}
+
+
+def pack_signatures(firmas, bits):
+    # Matriz (n, num_perm * bits / 8) uint8 con los `bits` bits bajos de cada
+    # hash; el primer hash de cada grupo ocupa los bits bajos del byte.
+    firmas = np.asarray(firmas)
+    por_byte = 8 // bits
+    bajos = (firmas & ((1 << bits) - 1)).astype(np.uint8).reshape(len(firmas), -1, por_byte)
+    empaquetadas = np.zeros(bajos.shape[:2], dtype=np.uint8)
+    for posicion in range(por_byte):
+        empaquetadas |= bajos[:, :, posicion] << np.uint8(posicion * bits)
+    return empaquetadas
+
+
+class DocumentStore:
+    # Documentos indexados en columnas: la matriz de firmas (una fila por
+    # documento, uint32 porque los hashes de MinHash son de 32 bits) y los
+    # ids, títulos y URLs en arenas de texto. Las filas son las claves del
+    # forest. En modo compacto la matriz completa se reemplaza por
+    # 'firmas_bbit', con b bits por hash, y self.firmas es None.
+    #
+    # Con casi duplicados agrupados, las primeras filas son los
+    # representantes (las únicas en el forest y el índice invertido, y las
+    # únicas con firma) y 'miembros_offsets' ubica, a continuación de ellos,
+    # los demás miembros de cada grupo.
+
+    def __init__(self, arrays, num_perm):
+        self.arrays = arrays
+        self.num_perm = num_perm
+        self.firmas = arrays.get('firmas')
+        self.firmas_bbit = arrays.get('firmas_bbit')
+        if self.firmas is not None:
+            self.bits = BITS_COMPLETOS
+        else:
+            self.bits = self.firmas_bbit.shape[1] * 8 // num_perm
+        self.miembros_offsets = arrays.get('miembros_offsets')
+        self.representantes = len(self) if self.miembros_offsets is None else len(self.miembros_offsets) - 1
+        # Las permutaciones se comparten entre todos los MinHash reconstruidos
+        # para no regenerarlas en cada consulta.
+        self.permutaciones = minhash_permutations(num_perm)
+
+    @classmethod
+    def from_records(cls, registros, firmas, num_perm, bits=BITS_COMPLETOS, miembros_offsets=None):
+        # registros: lista de (id, título, url) en el mismo orden que firmas;
+        # con miembros_offsets, firmas sólo trae las de los representantes.
+        columnas = list(zip(*registros)) if registros else [(), (), ()]
+        arrays = {}
+        for nombre, textos in zip(COLUMNAS_TEXTO, columnas):
+            arrays[nombre], arrays[nombre + '_offsets'] = _arena_de_textos(textos)
+        firmas = np.ascontiguousarray(firmas, dtype=np.uint32).reshape(-1, num_perm)
+        if bits == BITS_COMPLETOS:
+            arrays['firmas'] = firmas
+        elif bits in BITS_COMPACTOS:
+            arrays['firmas_bbit'] = pack_signatures(firmas, bits)
+        else:
+            raise ValueError(f"bits debe ser {BITS_COMPLETOS} o uno de {BITS_COMPACTOS}, no {bits}.")
+        if miembros_offsets is not None:
+            arrays['miembros_offsets'] = np.asarray(miembros_offsets, dtype=np.int64)
+        return cls(arrays, num_perm)
+
+    def __len__(self):
+        return len(self.arrays['ids_offsets']) - 1
+
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays.values())
+
+    def text(self, nombre, fila):
+        offsets = self.arrays[nombre + '_offsets']
+        return self.arrays[nombre][offsets[fila]:offsets[fila + 1]].tobytes().decode('utf-8')
+
+    def record(self, fila):
+        return self.text('ids', fila), self.text('titulos', fila), self.text('urls', fila)
+
+    def duplicates(self, fila):
+        # Filas de los casi duplicados que representa `fila`.
+        if self.miembros_offsets is None or fila >= self.representantes:
+            return range(0)
+        inicio = self.representantes + int(self.miembros_offsets[fila])
+        return range(inicio, self.representantes + int(self.miembros_offsets[fila + 1]))
+
+    def jaccard(self, filas, hashvalues):
+        # Jaccard estimado (fracción de posiciones iguales, como
+        # MinHash.jaccard) entre una firma y las filas indicadas.
+        if self.firmas is not None:
+            firma = np.asarray(hashvalues, dtype=np.uint32)
+            iguales = np.count_nonzero(self.firmas[filas] == firma, axis=1)
+            return iguales / np.float64(self.num_perm)
+
+        # Con b bits dos hashes distintos coinciden por azar con probabilidad
+        # 2^-b, así que P(coincidir) = J + (1 - J) 2^-b; se despeja J (Li y
+        # König, b-bit minwise hashing, para conjuntos chicos frente al
+        # universo de hashes).
+        firma = pack_signatures(np.asarray(hashvalues, dtype=np.uint32).reshape(1, -1), self.bits)
+        iguales = _IGUALES_POR_BYTE[self.bits][self.firmas_bbit[filas] ^ firma].sum(axis=1)
+        azar = 2.0 ** -self.bits
+        return np.clip((iguales / np.float64(self.num_perm) - azar) / (1 - azar), 0.0, 1.0)
+
+    def minhash(self, fila):
+        if self.firmas is None:
+            raise ValueError(f"El almacén sólo guarda {self.bits} bits por hash; no hay MinHash completo.")
+        return MinHash(num_perm=self.num_perm, hashvalues=self.firmas[fila], permutations=self.permutaciones)
+
+    def get(self, fila):
+        if not 0 <= fila < len(self):
+            return None
+        documento = {
+            'id': self.text('ids', fila),
+            'title': self.text('titulos', fila),
+            'url': self.text('urls', fila),
+        }
+        if self.firmas is not None and fila < self.representantes:
+            documento['minhash'] = self.minhash(fila)
+        return documento
@@ -0,0 +1,176 @@
+import json
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: se bloquea con msvcrt.
+    fcntl = None
+    import msvcrt
+
+from array_forest import ArrayForest
+from document_store import DocumentStore
+from inverted_index import InvertedIndex
+
+# Snapshot del índice: cabecera binaria, metadatos en JSON con la ubicación
+# de cada array y los arrays alineados a 64 bytes, listos para mapearse con
+# mmap en modo sólo lectura (las páginas se comparten entre procesos).
+MAGIA_SNAPSHOT = b"LSHS"
+VERSION_SNAPSHOT = 2
+ALINEACION = 64
+# Magia, versión, longitud de la cabecera JSON e inicio de los datos.
+FORMATO_CABECERA = '<4sBIQ'
+
+
+def save_snapshot(ruta, forest, data_store, inverted, num_perm, origen=None, umbral_duplicados=None,
+                  secuencia_delta=0):
+    # Las claves del forest y las filas del índice invertido son las filas
+    # del DocumentStore.
+    arrays = dict(data_store.arrays)
+    arrays.update({'forest_' + nombre: array for nombre, array in forest.arrays.items()})
+    arrays.update({'inverso_' + nombre: array for nombre, array in inverted.arrays.items()})
+
+    metadatos = {
+        'num_perm': num_perm,
+        'l': forest.l,
+        'k': forest.k,
+        'num_docs': len(data_store),
+        # Tamaño y fecha del archivo del que salió el índice, para detectar
+        # un snapshot desactualizado.
+        'origen': origen,
+        # Umbral con el que se agruparon los casi duplicados (0: sin agrupar).
+        'umbral_duplicados': umbral_duplicados,
+        # Último cambio del registro compartido (DeltaLog) incluido en el
+        # índice; los workers aplican sólo los posteriores.
+        'secuencia_delta': secuencia_delta,
+        'arrays': {},
+    }
+
+    # Los offsets de los arrays son relativos al inicio de los datos, que
+    # empiezan en el primer múltiplo de ALINEACION tras la cabecera JSON.
+    posicion = 0
+    for nombre, array in arrays.items():
+        metadatos['arrays'][nombre] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': posicion}
+        posicion += -(-array.nbytes // ALINEACION) * ALINEACION
+
+    cabecera_json = json.dumps(metadatos).encode('utf-8')
+    inicio_datos = -(-(struct.calcsize(FORMATO_CABECERA) + len(cabecera_json)) // ALINEACION) * ALINEACION
+
+    # Temporal propio de cada proceso: con varios workers de la API dos
+    # fusiones pueden escribir a la vez.
+    ruta_temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(ruta_temporal, 'wb') as f:
+        f.write(struct.pack(FORMATO_CABECERA, MAGIA_SNAPSHOT, VERSION_SNAPSHOT, len(cabecera_json), inicio_datos))
+        f.write(cabecera_json)
+        for nombre, array in arrays.items():
+            f.seek(inicio_datos + metadatos['arrays'][nombre]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+
+    # Se reemplaza de forma atómica para que otro proceso nunca lea un
+    # snapshot a medio escribir.
+    os.replace(ruta_temporal, ruta)
+
+
+class IndexSnapshot:
+
+    def __init__(self, ruta):
+        with open(ruta, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # Identifica el archivo mapeado aunque después se reemplace.
+            self.identidad = _identidad(os.fstat(f.fileno()))
+
+        magia, version, longitud_json, inicio_datos = struct.unpack_from(FORMATO_CABECERA, self._mmap)
+        if magia != MAGIA_SNAPSHOT or version != VERSION_SNAPSHOT:
+            raise ValueError(f"'{ruta}' no es un snapshot de índice compatible.")
+
+        inicio_json = struct.calcsize(FORMATO_CABECERA)
+        self.metadatos = json.loads(self._mmap[inicio_json:inicio_json + longitud_json].decode('utf-8'))
+
+        arrays = {}
+        for nombre, info in self.metadatos['arrays'].items():
+            dtype = np.dtype(info['dtype'])
+            cantidad = int(np.prod(info['shape'], dtype=np.int64))
+            arrays[nombre] = np.frombuffer(self._mmap, dtype=dtype, count=cantidad,
+                                           offset=inicio_datos + info['offset']).reshape(info['shape'])
+
+        self.forest = ArrayForest({nombre[len('forest_'):]: array for nombre, array in arrays.items()
+                                   if nombre.startswith('forest_')},
+                                  self.metadatos['l'], self.metadatos['k'])
+        self.data_store = DocumentStore({nombre: array for nombre, array in arrays.items()
+                                         if not nombre.startswith(('forest_', 'inverso_'))},
+                                        self.metadatos['num_perm'])
+        self.inverted = InvertedIndex({nombre[len('inverso_'):]: array for nombre, array in arrays.items()
+                                       if nombre.startswith('inverso_')})
+
+
+def load_snapshot(ruta, origen=None, num_perm=None, signature_bits=None, dedup_threshold=None):
+    # Devuelve None si no hay snapshot o si no corresponde al origen, al
+    # número de permutaciones, a los bits por hash o al umbral de casi
+    # duplicados actuales, para que se reconstruya el índice.
+    if not os.path.exists(ruta):
+        return None
+
+    try:
+        snapshot = IndexSnapshot(ruta)
+    except (ValueError, KeyError, struct.error) as e:
+        print(f"Snapshot '{ruta}' ilegible, se reconstruirá el índice: {e}")
+        return None
+    if origen is not None and snapshot.metadatos['origen'] != origen:
+        return None
+    if num_perm is not None and snapshot.metadatos['num_perm'] != num_perm:
+        return None
+    if signature_bits is not None and snapshot.data_store.bits != signature_bits:
+        return None
+    if dedup_threshold is not None and (snapshot.metadatos.get('umbral_duplicados') or 0) != dedup_threshold:
+        return None
+    return snapshot
+
+
+def _identidad(estado):
+    return estado.st_ino, estado.st_size, estado.st_mtime_ns
+
+
+def snapshot_identity(ruta):
+    # Identidad del snapshot que hay ahora en `ruta` (None si no existe), para
+    # compararla con IndexSnapshot.identidad y detectar uno más nuevo.
+    try:
+        return _identidad(os.stat(ruta))
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def snapshot_lock(ruta):
+    # Lock exclusivo entre procesos del mismo host sobre `ruta`.lock. Lo toma
+    # quien construye o reescribe el snapshot, para que varios workers de la
+    # API no hagan el mismo trabajo a la vez.
+    with open(ruta + ".lock", 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK se rinde tras unos 10 segundos de espera.
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def describe_source(ruta):
+    estado = os.stat(ruta)
+    return {'ruta': os.path.abspath(ruta), 'tamano': estado.st_size, 'mtime_ns': estado.st_mtime_ns}
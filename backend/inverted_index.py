@@ -0,0 +1,128 @@
+import numpy as np
+
+from huffman import decode_varints, encode_varints
+from signatures import token_ids
+
+# Índice invertido sobre los mismos tokens que make_shingle: para cada token
+# la lista ordenada de filas que lo contienen, guardada como diferencias
+# entre filas consecutivas en varints (7 bits por byte, el bit alto marca
+# continuación, con huffman.encode_varints).
+
+
+def _seleccionar_filas(ids, offsets, filas):
+    filas = np.asarray(filas, dtype=np.int64)
+    tamanos = offsets[filas + 1] - offsets[filas]
+    nuevos_offsets = np.zeros(len(filas) + 1, dtype=np.int64)
+    np.cumsum(tamanos, out=nuevos_offsets[1:])
+    # Posición de cada id dentro de su documento, más el inicio original.
+    posiciones = (np.arange(nuevos_offsets[-1]) - np.repeat(nuevos_offsets[:-1], tamanos)
+                  + np.repeat(offsets[filas], tamanos))
+    return ids[posiciones], nuevos_offsets
+
+
+class InvertedIndex:
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.tokens = arrays['tokens']
+        self.tokens_offsets = arrays['tokens_offsets']
+        self.postings = arrays['postings']
+        self.postings_offsets = arrays['postings_offsets']
+        # Cantidad de tokens distintos de cada fila, para el Jaccard exacto.
+        self.tamanos = arrays['tamanos']
+
+    @classmethod
+    def from_token_sets(cls, conjuntos):
+        vocabulario, ids, offsets = token_ids(conjuntos)
+        return cls.from_token_ids(list(vocabulario), ids, offsets)
+
+    @classmethod
+    def from_token_ids(cls, nombres, ids, offsets, filas=None):
+        # Documentos como ids de tokens en CSR; nombres[id] es el token. Sólo
+        # entran al índice los tokens que aparecen en algún documento. Con
+        # `filas` se indexan sólo esos documentos de la CSR, en ese orden.
+        if filas is not None:
+            ids, offsets = _seleccionar_filas(np.asarray(ids), np.asarray(offsets), filas)
+        usados, ids = np.unique(np.asarray(ids, dtype=np.int64), return_inverse=True)
+        nombres = [nombres[i] for i in usados.tolist()]
+        total = len(offsets) - 1
+
+        # El vocabulario se guarda ordenado para buscar tokens por bisección.
+        codificados = [nombre.encode('utf-8') for nombre in nombres]
+        alfabetico = sorted(range(len(nombres)), key=codificados.__getitem__)
+        rango = np.empty(len(nombres), dtype=np.int64)
+        rango[alfabetico] = np.arange(len(nombres))
+
+        tamanos = np.diff(offsets)
+        filas = np.repeat(np.arange(total, dtype=np.int64), tamanos)
+        tokens_por_aparicion = rango[ids] if len(ids) else ids
+        orden = np.argsort(tokens_por_aparicion, kind='stable')
+        filas = filas[orden]
+        frecuencias = np.bincount(tokens_por_aparicion, minlength=len(nombres))
+
+        # Dentro de cada token las filas ya están ordenadas; se guarda la
+        # primera tal cual y el resto como diferencias.
+        primeras = np.zeros(len(nombres) + 1, dtype=np.int64)
+        np.cumsum(frecuencias, out=primeras[1:])
+        diferencias = np.diff(filas, prepend=0)
+        diferencias[primeras[:-1][frecuencias > 0]] = filas[primeras[:-1][frecuencias > 0]]
+        postings, longitudes = encode_varints(diferencias)
+
+        bytes_acumulados = np.zeros(len(filas) + 1, dtype=np.int64)
+        np.cumsum(longitudes, out=bytes_acumulados[1:])
+
+        tokens_ordenados = [codificados[i] for i in alfabetico]
+        tokens_offsets = np.zeros(len(nombres) + 1, dtype=np.int64)
+        np.cumsum([len(token) for token in tokens_ordenados], out=tokens_offsets[1:])
+
+        return cls({
+            'tokens': np.frombuffer(b"".join(tokens_ordenados), dtype=np.uint8),
+            'tokens_offsets': tokens_offsets,
+            'postings': postings,
+            'postings_offsets': bytes_acumulados[primeras],
+            'tamanos': tamanos.astype(np.uint32),
+        })
+
+    def __len__(self):
+        return len(self.tamanos)
+
+    def _token(self, posicion):
+        return self.tokens[self.tokens_offsets[posicion]:self.tokens_offsets[posicion + 1]].tobytes()
+
+    def lookup(self, token):
+        # Posición del token en el vocabulario o None.
+        buscado = token.encode('utf-8')
+        bajo, alto = 0, len(self.tokens_offsets) - 1
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            if self._token(medio) < buscado:
+                bajo = medio + 1
+            else:
+                alto = medio
+        if bajo < len(self.tokens_offsets) - 1 and self._token(bajo) == buscado:
+            return bajo
+        return None
+
+    def rows(self, token):
+        posicion = self.lookup(token)
+        if posicion is None:
+            return np.zeros(0, dtype=np.int64)
+        datos = self.postings[self.postings_offsets[posicion]:self.postings_offsets[posicion + 1]]
+        return np.cumsum(decode_varints(datos)).astype(np.int64)
+
+    def search(self, tokens):
+        # Filas que comparten algún token con la consulta y su Jaccard exacto
+        # |q ∩ d| / |q ∪ d|. Las intersecciones salen de contar cuántas
+        # listas de la consulta contienen cada fila.
+        listas = [self.rows(token) for token in tokens]
+        listas = [lista for lista in listas if len(lista)]
+        if not listas:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        if len(listas) == 1:
+            filas = listas[0]
+            comunes = np.ones(len(filas), dtype=np.int64)
+        else:
+            filas, comunes = np.unique(np.concatenate(listas), return_counts=True)
+        union = len(tokens) + self.tamanos[filas].astype(np.int64) - comunes
+        return filas, comunes / union
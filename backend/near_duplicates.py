@@ -0,0 +1,85 @@
+import numpy as np
+
+# Casi duplicados por bandas de LSH: dos documentos son candidatos si
+# coinciden en todos los hashes de alguna banda. Con 8 hashes por banda y
+# 128 permutaciones (16 bandas), un par con Jaccard 0.8 es candidato con
+# probabilidad 0.95, uno con 0.9 con 0.999 y uno con 0.5 con 0.06.
+HASHES_POR_BANDA = 8
+# Pares que se comparan de una vez al verificar candidatos.
+PARES_POR_LOTE = 1 << 16
+
+
+def _similitudes(firmas, a, b):
+    # Jaccard estimado entre las filas a[i] y b[i], por lotes para no armar
+    # dos matrices (pares, num_perm) enteras.
+    similitudes = np.empty(len(a), dtype=np.float64)
+    for inicio in range(0, len(a), PARES_POR_LOTE):
+        tramo = slice(inicio, inicio + PARES_POR_LOTE)
+        iguales = np.count_nonzero(firmas[a[tramo]] == firmas[b[tramo]], axis=1)
+        similitudes[tramo] = iguales / np.float64(firmas.shape[1])
+    return similitudes
+
+
+def cluster_signatures(firmas, umbral, hashes_por_banda=HASHES_POR_BANDA):
+    # Para cada fila, la fila que la representa: la primera de su grupo de
+    # casi duplicados (Jaccard estimado >= umbral), o ella misma.
+    firmas = np.asarray(firmas)
+    total, num_perm = firmas.shape
+    representantes = np.arange(total, dtype=np.int64)
+    if total < 2:
+        return representantes
+
+    # Cada banda se reduce a un entero de 64 bits (las colisiones las
+    # descarta la verificación). Dentro de cada cubeta se empareja cada fila
+    # con la primera, así que los pares son lineales en el tamaño del grupo.
+    multiplicadores = np.random.RandomState(0).randint(1, 1 << 62, size=hashes_por_banda).astype(np.uint64) | np.uint64(1)
+    pares = []
+    for inicio in range(0, num_perm - hashes_por_banda + 1, hashes_por_banda):
+        banda = firmas[:, inicio:inicio + hashes_por_banda].astype(np.uint64)
+        claves = (banda * multiplicadores).sum(axis=1, dtype=np.uint64)
+        _, primeras, inversa = np.unique(claves, return_index=True, return_inverse=True)
+        primera = primeras[inversa.reshape(-1)]
+        otras = np.flatnonzero(primera != representantes)
+        pares.append(primera[otras] * total + otras)
+    pares = np.unique(np.concatenate(pares))
+    a, b = pares // total, pares % total
+    similares = _similitudes(firmas, a, b) >= umbral
+    a, b = a[similares], b[similares]
+
+    # Componentes conexas: cada fila toma la menor etiqueta de sus vecinas
+    # hasta que nada cambia.
+    while True:
+        nuevas = representantes.copy()
+        np.minimum.at(nuevas, b, representantes[a])
+        np.minimum.at(nuevas, a, representantes[b])
+        nuevas = nuevas[nuevas]
+        if np.array_equal(nuevas, representantes):
+            break
+        representantes = nuevas
+
+    # Una componente puede encadenar documentos cada vez menos parecidos: sólo
+    # se agrupan los que se parecen directamente a su representante.
+    miembros = np.flatnonzero(representantes != np.arange(total))
+    lejanos = _similitudes(firmas, miembros, representantes[miembros]) < umbral
+    representantes[miembros[lejanos]] = miembros[lejanos]
+    return representantes
+
+
+def collapse_order(representantes):
+    # Orden de filas con los representantes primero (en su orden original) y
+    # después los demás miembros agrupados por representante, y offsets
+    # (representantes + 1) de los miembros de cada uno a partir del primer
+    # miembro.
+    representantes = np.asarray(representantes, dtype=np.int64)
+    filas = np.arange(len(representantes))
+    es_representante = representantes == filas
+    principales = np.flatnonzero(es_representante)
+    posicion = np.empty(len(representantes), dtype=np.int64)
+    posicion[principales] = np.arange(len(principales))
+
+    miembros = np.flatnonzero(~es_representante)
+    grupos = posicion[representantes[miembros]]
+    miembros = miembros[np.argsort(grupos, kind='stable')]
+    offsets = np.zeros(len(principales) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(grupos, minlength=len(principales)), out=offsets[1:])
+    return np.concatenate([principales, miembros]), offsets
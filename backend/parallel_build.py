@@ -0,0 +1,167 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from signatures import DOCUMENTOS_POR_LOTE, signatures_from_ids, token_ids
+from tokenizer import make_shingle
+from vocabulary import minhash_permutations, permute_tokens
+
+# Fragmentos por worker: más de uno para repartir mejor la carga cuando los
+# títulos tienen largos muy distintos.
+FRAGMENTOS_POR_WORKER = 4
+# Filas mínimas que justifican un worker: arrancar un proceso (importar
+# numpy y datasketch) cuesta lo mismo que firmar unas decenas de miles de
+# títulos.
+FILAS_MINIMAS_POR_WORKER = 25000
+
+
+class _TablaCompartida:
+    # Lo que signatures_from_ids usa de un TokenVocabulary, sobre la tabla de
+    # hashes permutados que el proceso padre dejó en memoria compartida.
+
+    def __init__(self, filas):
+        self.num_perm = filas.shape[1]
+        self._filas = filas
+
+    def rows(self, ids):
+        return self._filas[ids]
+
+
+def _compartir(array):
+    memoria = SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=memoria.buf)[...] = array
+    return memoria
+
+
+def _firmar_ids(nombres, formas, inicio, fin):
+    # Corre en un worker: firma las filas [inicio, fin) a partir de los ids
+    # ya internados por el padre y escribe las firmas en la memoria
+    # compartida. No vuelve a tokenizar ni a hashear ningún título.
+    memorias = [SharedMemory(name=nombre) for nombre in nombres]
+    try:
+        ids, offsets, tabla, firmas = [np.ndarray(forma, dtype=dtype, buffer=memoria.buf)
+                                       for memoria, (forma, dtype) in zip(memorias, formas)]
+        firmas[inicio:fin] = signatures_from_ids(ids, offsets[inicio:fin + 1], _TablaCompartida(tabla))
+        del ids, offsets, tabla, firmas
+    finally:
+        for memoria in memorias:
+            memoria.close()
+    return fin - inicio
+
+
+def _tokenizar(titulos):
+    # Corre en un worker: tokeniza su tramo de títulos con un vocabulario
+    # propio. Devuelve los tokens en orden de id local, los ids locales de
+    # los títulos como lista plana y cuántos tokens tiene cada título.
+    vocabulario, ids, offsets = token_ids([make_shingle(titulo) for titulo in titulos])
+    return list(vocabulario), ids, np.diff(offsets)
+
+
+def _permutar(tokens, num_perm):
+    # Corre en un worker: hashes permutados de tokens que el vocabulario del
+    # padre todavía no tiene.
+    return permute_tokens(tokens, minhash_permutations(num_perm))
+
+
+def useful_workers(total, num_workers):
+    # Procesos que conviene usar para firmar `total` filas.
+    return max(1, min(num_workers, total // FILAS_MINIMAS_POR_WORKER))
+
+
+def build_pool(num_workers):
+    # Pool para pasar a parallel_token_ids y parallel_signatures_from_ids, así
+    # la construcción arranca los procesos una sola vez. 'spawn' porque el
+    # índice se construye desde un hilo del servidor y hacer fork de un
+    # proceso con hilos puede dejar locks tomados.
+    return ProcessPoolExecutor(max_workers=num_workers, mp_context=get_context('spawn'))
+
+
+@contextmanager
+def _pool(num_workers, ejecutor):
+    if ejecutor is not None:
+        yield ejecutor
+    else:
+        with build_pool(num_workers) as nuevo:
+            yield nuevo
+
+
+def _tramos(total, num_workers):
+    filas_por_fragmento = max(1, -(-total // (num_workers * FRAGMENTOS_POR_WORKER)))
+    return [(inicio, min(inicio + filas_por_fragmento, total)) for inicio in range(0, total, filas_por_fragmento)]
+
+
+def parallel_token_ids(titulos, vocabulario, num_workers=1, ejecutor=None):
+    # ids en `vocabulario` de los tokens de cada título, como lista plana con
+    # offsets (CSR); los títulos sin tokens quedan con largo 0. Con varios
+    # workers cada uno tokeniza un tramo con su propio vocabulario, el padre
+    # une los vocabularios (sólo un diccionario por token distinto de cada
+    # tramo) y los tokens nuevos se hashean repartidos entre los workers. El
+    # vocabulario queda igual que internando los títulos en orden.
+    total = len(titulos)
+    num_workers = useful_workers(total, num_workers)
+    if num_workers <= 1:
+        ids = []
+        tamanos = []
+        for inicio in range(0, total, DOCUMENTOS_POR_LOTE):
+            lote = [make_shingle(titulo) for titulo in titulos[inicio:inicio + DOCUMENTOS_POR_LOTE]]
+            ids.append(vocabulario.intern(lote)[0])
+            tamanos.extend(map(len, lote))
+        offsets = np.zeros(total + 1, dtype=np.int64)
+        np.cumsum(tamanos, out=offsets[1:])
+        return np.concatenate(ids) if ids else np.zeros(0, dtype=np.int64), offsets
+
+    with _pool(num_workers, ejecutor) as pool:
+        tramos = list(pool.map(_tokenizar, [titulos[inicio:fin] for inicio, fin in _tramos(total, num_workers)]))
+
+        # Tokens que el vocabulario no tiene, en orden de primera aparición.
+        nuevos = {}
+        for tokens, _, _ in tramos:
+            for token in tokens:
+                if token not in vocabulario.ids and token not in nuevos:
+                    nuevos[token] = None
+        nuevos = list(nuevos)
+        partes = [nuevos[inicio:fin] for inicio, fin in _tramos(len(nuevos), num_workers)]
+        filas = list(pool.map(_permutar, partes, [vocabulario.num_perm] * len(partes)))
+    if nuevos:
+        vocabulario.add(nuevos, np.concatenate(filas))
+
+    ids = []
+    tamanos = []
+    for tokens, ids_locales, longitudes in tramos:
+        globales = np.fromiter((vocabulario.ids[token] for token in tokens), dtype=np.int64, count=len(tokens))
+        ids.append(globales[ids_locales])
+        tamanos.append(longitudes)
+    offsets = np.zeros(total + 1, dtype=np.int64)
+    np.cumsum(np.concatenate(tamanos), out=offsets[1:])
+    return np.concatenate(ids), offsets
+
+
+def parallel_signatures_from_ids(ids, offsets, vocabulario, num_workers=1, ejecutor=None):
+    # Firmas (uint32) de documentos ya internados en `vocabulario` (ids de
+    # tokens en CSR). Los ids, los offsets y la tabla de hashes permutados
+    # se pasan a los workers por memoria compartida: los títulos ya están
+    # tokenizados y hasheados y los workers sólo calculan los mínimos.
+    total = len(offsets) - 1
+    num_workers = useful_workers(total, num_workers)
+    if num_workers <= 1:
+        return signatures_from_ids(ids, offsets, vocabulario).astype(np.uint32)
+
+    entradas = [np.ascontiguousarray(ids, dtype=np.int64), np.ascontiguousarray(offsets, dtype=np.int64),
+                np.ascontiguousarray(vocabulario.table())]
+    memorias = [_compartir(array) for array in entradas]
+    memorias.append(SharedMemory(create=True, size=max(1, total * vocabulario.num_perm * 4)))
+    formas = [(array.shape, array.dtype) for array in entradas] + [((total, vocabulario.num_perm), np.uint32)]
+    try:
+        with _pool(num_workers, ejecutor) as pool:
+            tareas = [pool.submit(_firmar_ids, [memoria.name for memoria in memorias], formas, inicio, fin)
+                      for inicio, fin in _tramos(total, num_workers)]
+            for tarea in tareas:
+                tarea.result()
+        return np.ndarray((total, vocabulario.num_perm), dtype=np.uint32, buffer=memorias[-1].buf).copy()
+    finally:
+        for memoria in memorias:
+            memoria.close()
+            memoria.unlink()
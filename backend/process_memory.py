@@ -0,0 +1,18 @@
+import os
+import resource
+import sys
+
+
+def pico_rss_bytes():
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KiB, macOS bytes.
+    return pico if sys.platform == 'darwin' else pico * 1024
+
+
+def rss_actual_bytes():
+    # Sólo Linux; en otros sistemas se informa None.
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return None
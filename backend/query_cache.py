@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    # Caché LRU con caducidad para resultados de búsqueda. Cada consulta se
+    # guarda junto a la generación del índice con que se calculó: si el
+    # índice cambia (reconstrucción o actualización) la caché se vacía en el
+    # siguiente acceso.
+
+    def __init__(self, max_entries=1024, ttl=300.0, reloj=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.reloj = reloj
+        self.generacion = None
+        self.hits = 0
+        self.misses = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _sincronizar(self, generacion):
+        # Devuelve False si la generación es anterior a la actual: es una
+        # búsqueda que empezó antes de cambiar el índice y no debe tocar la
+        # caché.
+        if self.generacion is not None and generacion < self.generacion:
+            return False
+        if generacion != self.generacion:
+            self._entradas.clear()
+            self.generacion = generacion
+        return True
+
+    def get(self, clave, generacion):
+        with self._lock:
+            entrada = self._entradas.get(clave) if self._sincronizar(generacion) else None
+            if entrada is not None and self.reloj() - entrada[0] > self.ttl:
+                del self._entradas[clave]
+                entrada = None
+
+            if entrada is None:
+                self.misses += 1
+                return None
+
+            self._entradas.move_to_end(clave)
+            self.hits += 1
+            return entrada[1]
+
+    def put(self, clave, generacion, valor):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if not self._sincronizar(generacion):
+                return
+            self._entradas[clave] = (self.reloj(), valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entries:
+                self._entradas.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def stats(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                'entries': len(self._entradas),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'generation': self.generacion,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / consultas if consultas else 0.0,
+            }
@@ -1,107 +1,700 @@
 
-import pandas as pd
+import csv
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from multiprocessing import get_context
+
+import numpy as np
 import datasketch
-from datasketch import MinHash, MinHashLSHForest
-from six import StringIO
+from datasketch import MinHash
 from huffman import HuffmanCompressor
+from index_snapshot import describe_source, load_snapshot, save_snapshot, snapshot_identity, snapshot_lock
+from signatures import build_signatures, token_ids
+from document_store import DocumentStore
+from query_cache import QueryCache
+from delta_segment import DeltaSegment
+from delta_log import DeltaLog
+from inverted_index import InvertedIndex
+from near_duplicates import cluster_signatures, collapse_order
+from array_forest import ArrayForest
+from parallel_build import build_pool, parallel_signatures_from_ids, parallel_token_ids, useful_workers
+from tokenizer import make_shingle
+from vocabulary import minhash_permutations, token_vocabulary
+from sharded_engine import ShardedSearchEngine
 
 NUM_PERMUTACIONES = 128
+# Bits por hash que el almacén guarda para re-ordenar candidatos: 32 son las
+# firmas completas; 8, 4, 2 o 1 guardan sólo los bits bajos (b-bit MinHash),
+# con un estimador de Jaccard corregido por las coincidencias al azar.
+SIGNATURE_BITS = 32
+# Con firmas compactas las claves del forest también se truncan, a estos
+# bits por hash: el forest deja de ser la copia completa de las firmas (una
+# fusión vuelve a firmar los títulos) y ocupa la mitad.
+FOREST_KEY_BITS_COMPACT = 16
+
+# Al construir el índice, los documentos con Jaccard estimado mayor o igual a
+# este umbral (la misma noticia o receta bajo varias URLs, páginas de tags)
+# se agrupan: sólo uno entra al forest y al índice invertido y los demás se
+# devuelven adjuntos a él en 'duplicates'. 0 lo desactiva.
+DEDUP_THRESHOLD = 0.8
+
 RESULTS_PER_PAGE = 10
 
-COMPRESSED_FILENAME = "../urls_new.ziphuff"
+# Caché de resultados: número máximo de consultas guardadas y segundos que
+# vale cada una. SEARCH_QUERY_CACHE_SIZE=0 la desactiva, también en los
+# procesos shard, que heredan el entorno.
+QUERY_CACHE_SIZE = int(os.environ.get('SEARCH_QUERY_CACHE_SIZE', 1024))
+QUERY_CACHE_TTL = 300.0
+
+# Cantidad de cambios pendientes a partir de la cual el segmento delta se
+# fusiona en segundo plano con el índice principal.
+DELTA_MERGE_THRESHOLD = 5000
+
+# Consultas de hasta esta cantidad de tokens se resuelven con el índice
+# invertido (Jaccard exacto); las más largas con el LSH Forest.
+SHORT_QUERY_TOKENS = 3
+# Candidatos que se re-ordenan por consulta, en ambos caminos.
+MAX_CANDIDATES = 100
+
+# Procesos que firman los títulos al construir el índice.
+BUILD_WORKERS = os.cpu_count() or 1
+
+# Con más de un shard los documentos se reparten por hash del id entre
+# procesos, cada uno con su propio índice, y las consultas se envían a todos.
+SEARCH_SHARDS = 1
 
-#compressor = HuffmanCompressor()
+# El índice se construye en un proceso aparte que sólo escribe el snapshot:
+# su memoria temporal se libera al terminar y quien lo lanzó sólo mapea el
+# archivo, como cualquier otro worker.
+BUILD_IN_SUBPROCESS = True
 
-#datos_descomprimidos = compressor.decompress_to_string(COMPRESSED_FILENAME)
+# Cada cuántos segundos se aplican los cambios que otros procesos (otros
+# workers de la API) dejaron en el registro compartido y se revisa si alguno
+# escribió un snapshot más nuevo, para pasar a usarlo. 0 lo desactiva.
+SNAPSHOT_RELOAD_INTERVAL = 5.0
 
-CSV_FILE = '../scanned_urls_202510192249.csv'
+# Rutas relativas a este archivo, no al directorio desde el que se arranca.
+DIRECTORIO_DATOS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-forest = MinHashLSHForest(num_perm=NUM_PERMUTACIONES)
-data_store = {}
+# El índice se construye desde el .ziphuff si existe y, si no, desde el CSV.
+COMPRESSED_FILENAME = os.path.join(DIRECTORIO_DATOS, 'scanned_urls_202510192249.csv.ziphuff')
+CSV_FILE = os.path.join(DIRECTORIO_DATOS, 'scanned_urls_202510192249.csv')
+SNAPSHOT_FILE = os.path.join(DIRECTORIO_DATOS, 'scanned_urls_202510192249.snapshot')
+
+data_store = DocumentStore.from_records([], [], NUM_PERMUTACIONES)
+forest = ArrayForest.from_signatures(data_store.firmas, NUM_PERMUTACIONES)
+inverted_index = InvertedIndex.from_token_sets([])
+# Se incrementa cada vez que cambia el índice; invalida la caché.
+index_generation = 0
+# (forest, data_store, índice invertido, generación) publicados juntos en una
+# sola asignación para que una búsqueda nunca mezcle un forest nuevo con un
+# almacén viejo.
+indice_actual = (forest, data_store, inverted_index, index_generation)
+query_cache = QueryCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+# Altas, modificaciones y bajas posteriores a la construcción del índice.
+delta_segment = DeltaSegment(NUM_PERMUTACIONES)
+# Registro de esos cambios compartido con los demás procesos que sirven el
+# mismo snapshot (None si el índice vive en memoria propia del proceso).
+delta_log = None
+_registro_lock = threading.Lock()
+# Origen del índice principal, para guardar el snapshot tras una fusión.
+indice_origen = None
+# Snapshot mapeado que se está sirviendo (None si el índice vive en memoria
+# propia del proceso) y cuándo toca volver a mirar si hay uno nuevo.
+snapshot_actual = None
+_proxima_revision = 0.0
+_publicar_lock = threading.Lock()
+_merge_lock = threading.Lock()
+# ShardedSearchEngine activo cuando SEARCH_SHARDS > 1.
+motor_particionado = None
 
 results_data = []
 current_page = 0
 window = None
 
 
-def make_shingle(text: str):
-    if not text:
-        return set()
-    text = str(text).lower()
-    return set(text.split())
+def publish_index(nuevo_forest, nuevo_store, nuevo_inverso, snapshot=None):
+    global forest, data_store, inverted_index, index_generation, indice_actual, snapshot_actual
+
+    with _publicar_lock:
+        forest, data_store, inverted_index = nuevo_forest, nuevo_store, nuevo_inverso
+        snapshot_actual = snapshot
+        index_generation += 1
+        indice_actual = (nuevo_forest, nuevo_store, nuevo_inverso, index_generation)
+
+
+def _nueva_generacion():
+    # Mismo índice, generación nueva: invalida la caché tras cambios que no
+    # pasan por publish_index (segmento delta, shards).
+    global index_generation, indice_actual
+
+    with _publicar_lock:
+        index_generation += 1
+        indice_actual = indice_actual[:3] + (index_generation,)
+
+
+def _publicar_snapshot(snapshot):
+    # Primero se publica el índice nuevo y después se retiran del delta los
+    # cambios que ya incluye, para que ningún documento desaparezca entre medio.
+    publish_index(snapshot.forest, snapshot.data_store, snapshot.inverted, snapshot)
+    delta_segment.discard_through(_secuencia_snapshot(snapshot))
+
+
+def _secuencia_snapshot(snapshot):
+    return snapshot.metadatos.get('secuencia_delta') or 0
+
+
+def _revisar_snapshot():
+    # Con varios workers, cada uno aplica acá los cambios que los demás
+    # dejaron en el registro compartido y, si otro fusionó el delta y
+    # reescribió el snapshot, pasa a mapear el archivo nuevo.
+    global _proxima_revision
+
+    ahora = time.monotonic()
+    if not SNAPSHOT_RELOAD_INTERVAL or ahora < _proxima_revision or snapshot_actual is None:
+        return
+    _proxima_revision = ahora + SNAPSHOT_RELOAD_INTERVAL
+    if delta_log is not None:
+        _sincronizar_registro()
+    _recargar_snapshot()
+
+
+def _recargar_snapshot():
+    # Va después de leer el registro: lo que otro proceso haya quitado del
+    # registro al compactarlo ya está en el snapshot que se encuentre acá.
+    if snapshot_actual is None or snapshot_identity(SNAPSHOT_FILE) == snapshot_actual.identidad:
+        return
+
+    snapshot = load_snapshot(SNAPSHOT_FILE, indice_origen, NUM_PERMUTACIONES, SIGNATURE_BITS, DEDUP_THRESHOLD)
+    if snapshot is not None:
+        print(f"Snapshot '{SNAPSHOT_FILE}' actualizado por otro proceso, recargando.")
+        _publicar_snapshot(snapshot)
+
+
+def _sincronizar_registro(cambios=()):
+    # Agrega `cambios` (id, título, url; título None para una baja) al
+    # registro compartido y pasa al delta todo lo nuevo del registro, propio
+    # o de otros workers, firmado en este proceso. Bajo un lock para que el
+    # delta reciba los cambios en el orden del registro.
+    with _registro_lock:
+        entradas = delta_log.append(cambios) if cambios else delta_log.read()
+        vivas = [titulo for _, _, titulo, _ in entradas if titulo is not None]
+        firmas = iter(build_signatures([make_shingle(titulo) for titulo in vivas], NUM_PERMUTACIONES))
+        delta_segment.apply((secuencia, csv_id, None if titulo is None else (titulo, url, next(firmas)))
+                            for secuencia, csv_id, titulo, url in entradas)
+    if entradas:
+        _nueva_generacion()
+
+
+@contextmanager
+def _etapa(tiempos, nombre):
+    # Suma a tiempos[nombre] los segundos del bloque, si se piden tiempos.
+    inicio = time.perf_counter()
+    yield
+    if tiempos is not None:
+        tiempos[nombre] = tiempos.get(nombre, 0.0) + time.perf_counter() - inicio
+
+
+def _construir_indice(registros, firmas, tokens=None, tiempos=None):
+    # Almacén, forest e índice invertido para documentos (id, título, url)
+    # ya firmados. Las claves del forest y las filas del índice invertido
+    # son las filas del almacén, las mismas que usa el snapshot. tokens es
+    # (nombres, ids, offsets) de los títulos, como los da token_ids.
+    if tokens is None:
+        tokens = token_ids([make_shingle(titulo) for _, titulo, _ in registros])
+    firmas = np.ascontiguousarray(firmas, dtype=np.uint32).reshape(len(registros), NUM_PERMUTACIONES)
+
+    orden = np.arange(len(registros))
+    miembros_offsets = None
+    if DEDUP_THRESHOLD:
+        with _etapa(tiempos, 'duplicados'):
+            orden, miembros_offsets = collapse_order(cluster_signatures(firmas, DEDUP_THRESHOLD))
+            registros = [registros[fila] for fila in orden.tolist()]
+            firmas = firmas[orden]
+        print(f"Casi duplicados: {len(registros) - (len(miembros_offsets) - 1)} documentos agrupados "
+              f"bajo {np.count_nonzero(np.diff(miembros_offsets))} representantes.")
+    representantes = len(registros) if miembros_offsets is None else len(miembros_offsets) - 1
+
+    nombres, ids, offsets = tokens
+    with _etapa(tiempos, 'indice_invertido'):
+        nuevo_inverso = InvertedIndex.from_token_ids(list(nombres), ids, offsets, orden[:representantes])
+    firmas = firmas[:representantes]
+    with _etapa(tiempos, 'almacen'):
+        nuevo_store = DocumentStore.from_records(registros, firmas, NUM_PERMUTACIONES, SIGNATURE_BITS,
+                                                 miembros_offsets)
+    with _etapa(tiempos, 'forest'):
+        nuevo_forest = ArrayForest.from_signatures(firmas, NUM_PERMUTACIONES, bits=_bits_forest())
+    return nuevo_forest, nuevo_store, nuevo_inverso
+
+
+def _bits_forest():
+    return 32 if SIGNATURE_BITS == 32 else FOREST_KEY_BITS_COMPACT
+
+
+def _guardar_snapshot(nuevo_forest, nuevo_store, nuevo_inverso, secuencia):
+    # Devuelve el snapshot recién escrito ya mapeado, para servir desde las
+    # mismas páginas que el resto de procesos, o None si no se pudo guardar.
+    # `secuencia` es el último cambio del registro compartido que incluye.
+    print(f"Guardando snapshot '{SNAPSHOT_FILE}'...")
+    try:
+        save_snapshot(SNAPSHOT_FILE, nuevo_forest, nuevo_store, nuevo_inverso, NUM_PERMUTACIONES, indice_origen,
+                      DEDUP_THRESHOLD, secuencia)
+    except OSError as e:
+        print(f"No se pudo guardar el snapshot: {e}")
+        return None
+    return load_snapshot(SNAPSHOT_FILE, indice_origen, NUM_PERMUTACIONES, SIGNATURE_BITS, DEDUP_THRESHOLD)
+
+
+def _fuente_indice():
+    return COMPRESSED_FILENAME if os.path.exists(COMPRESSED_FILENAME) else CSV_FILE
+
+
+def _filas_csv(ruta):
+    with open(ruta, 'r', encoding='utf-8', newline='') as f:
+        for fila in csv.DictReader(f):
+            yield fila['id'], fila['title'], fila['url']
+
+
+def _leer_registros(ruta):
+    # (id, título, url) de todos los documentos. Las filas del .ziphuff se
+    # parsean a medida que se descomprimen, sin armar el texto completo en
+    # memoria.
+    print(f"Cargando documentos de '{ruta}'...")
+    if ruta.endswith('.ziphuff'):
+        filas = HuffmanCompressor().read_records(ruta, ['id', 'title', 'url'])
+    else:
+        filas = _filas_csv(ruta)
+    return list(filas)
+
+
+def build_index_from_records(registros):
+    # Índice en memoria, sin snapshot, para los documentos dados. Es lo que
+    # construye cada proceso shard con su parte del corpus.
+    registros = [(str(csv_id), str(titulo), str(url)) for csv_id, titulo, url in registros]
+    shingles = [make_shingle(titulo) for _, titulo, _ in registros]
+    vivos = [posicion for posicion, shingle in enumerate(shingles) if shingle]
+    registros = [registros[posicion] for posicion in vivos]
+    shingles = [shingles[posicion] for posicion in vivos]
+
+    firmas = build_signatures(shingles, NUM_PERMUTACIONES)
+    publish_index(*_construir_indice(registros, firmas, token_ids(shingles)))
+    return len(registros)
 
 
 def build_index_on_startup():
-    global forest, data_store
+    global indice_origen, motor_particionado, delta_log
 
     print("--- [MOTOR] Iniciando ---")
-    print(f"Cargando CSV '{CSV_FILE}'...")
+    fuente = _fuente_indice()
     try:
-        df = pd.read_csv(CSV_FILE)
-        df.dropna(subset=['title'], inplace=True)
+        origen = describe_source(fuente)
     except FileNotFoundError:
         print("--- [ERROR FATAL] ---")
-        print(f"No se encontró el archivo '{CSV_FILE}'.")
+        print(f"No se encontró el archivo '{fuente}'.")
         print("Asegúrate de que el CSV esté en la misma carpeta.")
         print("---------------------")
         return False
 
-    print(f"Creando MinHashes para {len(df)} documentos...")
-    for index, row in df.iterrows():
-        csv_id = str(row['id'])
-        titulo = str(row['title'])
-        url = str(row['url'])
-        m = datasketch.MinHash(num_perm=NUM_PERMUTACIONES)
-        shingle = make_shingle(titulo)
-        if not shingle:
-            continue
+    if SEARCH_SHARDS > 1:
+        # Los shards no usan el snapshot ni el registro compartido: cada
+        # arranque reconstruye todo en memoria y los cambios se pierden al
+        # reiniciar.
+        registros = _leer_registros(fuente)
+        print(f"Repartiendo {len(registros)} documentos en {SEARCH_SHARDS} shards...")
+        motor = ShardedSearchEngine(SEARCH_SHARDS)
+        motor.build(registros)
+        if motor_particionado is not None:
+            motor_particionado.close()
+        motor_particionado = motor
+        _nueva_generacion()
+        print("--- [MOTOR] ¡Índice listo! ---")
+        return True
 
-        for s in shingle:
-            m.update(s.encode('utf-8'))
+    indice_origen = origen
+    snapshot = load_snapshot(SNAPSHOT_FILE, origen, NUM_PERMUTACIONES, SIGNATURE_BITS, DEDUP_THRESHOLD)
+    if snapshot is None:
+        # Un solo proceso por host construye el índice: con varios workers de
+        # la API el resto espera el lock y después mapea el mismo snapshot.
+        with snapshot_lock(SNAPSHOT_FILE):
+            snapshot = load_snapshot(SNAPSHOT_FILE, origen, NUM_PERMUTACIONES, SIGNATURE_BITS, DEDUP_THRESHOLD)
+            if snapshot is None and BUILD_IN_SUBPROCESS:
+                snapshot = _construir_en_subproceso(fuente)
+            if snapshot is None:
+                secuencia = _secuencia_registro()
+                nuevo_indice = _construir_desde_fuente(fuente)
+                snapshot = _guardar_snapshot(*nuevo_indice, secuencia)
+                if snapshot is None:
+                    publish_index(*nuevo_indice)
+                    print("--- [MOTOR] ¡Índice listo! ---")
+                    return True
 
-        data_store[csv_id] = {'title': titulo, 'url': url, 'minhash': m}
+    print(f"Índice cargado desde el snapshot '{SNAPSHOT_FILE}'.")
+    delta_log = DeltaLog(SNAPSHOT_FILE + '.delta', _secuencia_snapshot(snapshot))
+    _publicar_snapshot(snapshot)
+    # Cambios que otros workers (o este proceso antes de reiniciarse) dejaron
+    # en el registro y todavía no se fusionaron.
+    _sincronizar_registro()
+    print("--- [MOTOR] ¡Índice listo! ---")
+    return True
 
-    print(f"Poblando el índice LSHForest con {len(data_store)} elementos...")
-    for csv_id, data in data_store.items():
-        forest.add(csv_id, data['minhash'])
 
-    print("Finalizando índice (esto puede tardar un momento)...")
-    forest.index()
+def _construir_en_subproceso(fuente):
+    # Devuelve el snapshot que escribió el proceso constructor, o None si
+    # falló (y entonces se construye en este proceso).
+    print("Construyendo el índice en un proceso aparte...")
+    proceso = get_context('spawn').Process(target=_proceso_constructor, args=(fuente, SNAPSHOT_FILE))
+    proceso.start()
+    proceso.join()
+    if proceso.exitcode != 0:
+        print(f"El proceso constructor terminó con código {proceso.exitcode}.")
+        return None
+    return load_snapshot(SNAPSHOT_FILE, indice_origen, NUM_PERMUTACIONES, SIGNATURE_BITS, DEDUP_THRESHOLD)
 
-    print("--- [MOTOR] ¡Índice listo! ---")
-    return True
+
+def _proceso_constructor(fuente, ruta_snapshot):
+    global SNAPSHOT_FILE, indice_origen
+
+    SNAPSHOT_FILE = ruta_snapshot
+    indice_origen = describe_source(fuente)
+    secuencia = _secuencia_registro()
+    nuevo_forest, nuevo_store, nuevo_inverso = _construir_desde_fuente(fuente)
+    print(f"Guardando snapshot '{SNAPSHOT_FILE}'...")
+    save_snapshot(SNAPSHOT_FILE, nuevo_forest, nuevo_store, nuevo_inverso, NUM_PERMUTACIONES, indice_origen,
+                  DEDUP_THRESHOLD, secuencia)
 
 
-def run_real_search(query):
-    global forest, data_store
+def _secuencia_registro():
+    # Último cambio del registro compartido: un índice construido desde la
+    # fuente reemplaza a esos cambios igual que al snapshot anterior.
+    registro = DeltaLog(SNAPSHOT_FILE + '.delta')
+    registro.read()
+    return registro.secuencia
 
+
+def _construir_desde_fuente(fuente, tiempos=None):
+    # Con `tiempos` (un dict) se anotan los segundos de cada etapa, para
+    # bench_build.py.
+    with _etapa(tiempos, 'lectura'):
+        registros = _leer_registros(fuente)
+    vocabulario = token_vocabulary(NUM_PERMUTACIONES)
+
+    num_workers = useful_workers(len(registros), BUILD_WORKERS)
+    print(f"Creando MinHashes para {len(registros)} documentos con {num_workers} procesos...")
+    # Los mismos procesos tokenizan los títulos (cada uno con su vocabulario,
+    # que después se unen en `vocabulario`) y calculan los mínimos sobre los
+    # ids en memoria compartida. Con un worker se hace todo acá, por lotes y
+    # sin guardar un conjunto de tokens por documento.
+    with build_pool(num_workers) if num_workers > 1 else nullcontext() as ejecutor:
+        with _etapa(tiempos, 'tokens'):
+            ids, offsets = parallel_token_ids([titulo for _, titulo, _ in registros], vocabulario, num_workers,
+                                              ejecutor)
+            # Fuera los documentos sin ningún token en el título.
+            vivos = np.flatnonzero(np.diff(offsets))
+            registros = [registros[fila] for fila in vivos.tolist()]
+            offsets = np.concatenate([[0], offsets[vivos + 1]])
+        with _etapa(tiempos, 'firmas'):
+            firmas = parallel_signatures_from_ids(ids, offsets, vocabulario, num_workers, ejecutor)
+
+    print(f"Poblando el índice LSHForest con {len(registros)} elementos...")
+    nuevo_forest, nuevo_store, nuevo_inverso = _construir_indice(registros, firmas,
+                                                                (vocabulario.tokens, ids, offsets), tiempos)
+    print(f"Almacén de documentos: {nuevo_store.nbytes() / 2**20:.1f} MiB")
+    return nuevo_forest, nuevo_store, nuevo_inverso
+
+
+def run_real_search(query, limit=None):
     query_shingle = make_shingle(query)
     if not query_shingle:
         return []
+    _revisar_snapshot()
 
-    query_minhash = datasketch.MinHash(NUM_PERMUTACIONES)
-    for s in query_shingle:
-        query_minhash.update(s.encode('utf-8'))
+    # La clave es el conjunto de tokens: consultas que sólo difieren en
+    # mayúsculas, espacios u orden de palabras comparten entrada.
+    clave = (frozenset(query_shingle), limit)
+    forest_actual, store_actual, inverso_actual, generacion = indice_actual
+    resultados = query_cache.get(clave, generacion)
+    if resultados is None:
+        if motor_particionado is not None:
+            # Cada shard devuelve sus mejores resultados y se mezclan hasta
+            # el mismo tope que tiene una búsqueda sin shards.
+            resultados = motor_particionado.search(query, limit or MAX_CANDIDATES)
+        else:
+            resultados = _buscar(forest_actual, store_actual, inverso_actual, query_shingle, limit)
+        query_cache.put(clave, generacion, resultados)
 
-    result_keys = forest.query(query_minhash, k=100)
+    # Copias para que quien llama pueda modificar los resultados sin tocar
+    # la caché.
+    return [{**resultado, 'duplicates': [dict(duplicado) for duplicado in resultado['duplicates']]}
+            for resultado in resultados]
 
-    lista_resultados = []
-    for csv_id_key in result_keys:
-        item_similar = data_store.get(csv_id_key)
-        if not item_similar:
+
+def search_cache_stats():
+    return query_cache.stats()
+
+
+def clear_search_cache():
+    if motor_particionado is not None:
+        motor_particionado.clear_cache()
+    query_cache.clear()
+
+
+def add_documents(documentos):
+    # Alta o reemplazo de documentos (id, título, url). Se firman sólo los
+    # documentos recibidos y van al segmento delta, que se busca junto al
+    # índice principal. Un título sin tokens equivale a borrar el id.
+    if motor_particionado is not None:
+        indexados = motor_particionado.add_documents(list(documentos))
+        _nueva_generacion()
+        return indexados
+
+    registros = []
+    shingles = []
+    vacios = []
+    # Todos en el orden recibido, las bajas con título None.
+    cambios = []
+    for csv_id, titulo, url in documentos:
+        shingle = make_shingle(titulo)
+        if not shingle:
+            vacios.append(str(csv_id))
+            cambios.append((str(csv_id), None, None))
             continue
+        registros.append((str(csv_id), str(titulo), str(url)))
+        shingles.append(shingle)
+        cambios.append(registros[-1])
 
-        minhash_similar = item_similar['minhash']
-        sim = query_minhash.jaccard(minhash_similar)
+    if delta_log is not None:
+        # Con el índice en un snapshot los cambios van al registro compartido,
+        # de donde los toman este proceso y los demás workers.
+        _sincronizar_registro(cambios)
+        _despues_de_cambios()
+        return len(registros)
+
+    firmas = build_signatures(shingles, NUM_PERMUTACIONES)
+    delta_segment.upsert((csv_id, titulo, url, firma) for (csv_id, titulo, url), firma in zip(registros, firmas))
+    delta_segment.delete(vacios)
+    _despues_de_cambios()
+    return len(registros)
+
+
+def delete_documents(ids):
+    ids = [str(csv_id) for csv_id in ids]
+    if motor_particionado is not None:
+        motor_particionado.delete_documents(ids)
+        _nueva_generacion()
+        return len(ids)
+
+    if delta_log is not None:
+        _sincronizar_registro([(csv_id, None, None) for csv_id in ids])
+    else:
+        delta_segment.delete(ids)
+    _despues_de_cambios()
+    return len(ids)
+
+
+def _despues_de_cambios():
+    # Nueva generación con el mismo índice principal: invalida la caché. El
+    # delta se fusiona en segundo plano y por lotes, al llegar al umbral.
+    _nueva_generacion()
+    if len(delta_segment) >= DELTA_MERGE_THRESHOLD:
+        start_background_merge(DELTA_MERGE_THRESHOLD)
+
+
+def start_background_merge(minimo=1):
+    if motor_particionado is not None:
+        return motor_particionado.start_background_merge()
+    if _merge_lock.locked():
+        return False
+    threading.Thread(target=merge_delta, kwargs={'minimo': minimo}, daemon=True).start()
+    return True
+
+
+def merge_delta(esperar=False, minimo=1):
+    # Reconstruye el índice principal con los cambios pendientes del delta,
+    # si hay al menos `minimo`. Las escrituras que lleguen mientras tanto
+    # siguen yendo al delta y no se pierden: sólo se descartan los cambios
+    # que se fusionaron. Con esperar, si ya hay una fusión en curso se espera
+    # a que termine y se fusiona lo que haya quedado pendiente.
+    if not _merge_lock.acquire(blocking=esperar):
+        return False
+    try:
+        if delta_log is None:
+            return _fusionar_pendientes(minimo)
+        # Con el registro compartido fusiona un worker por vez, sobre el
+        # último snapshot escrito y con los cambios de todos: los demás
+        # esperan el lock y, al recargar, ya no tienen qué fusionar.
+        with snapshot_lock(SNAPSHOT_FILE):
+            _sincronizar_registro()
+            _recargar_snapshot()
+            return _fusionar_pendientes(minimo)
+    finally:
+        _merge_lock.release()
+
+
+def _fusionar_pendientes(minimo):
+    # La secuencia sólo cuenta con el registro compartido: sin él son números
+    # locales del delta.
+    pendientes, secuencia = delta_segment.pending()
+    if not pendientes or len(pendientes) < minimo:
+        return True
+
+    print(f"--- [MOTOR] Fusionando {len(pendientes)} cambios ---")
+    nuevo_store = _fusionar(indice_actual[0], indice_actual[1], pendientes, secuencia if delta_log is not None else 0)
+    print(f"--- [MOTOR] Fusión terminada: {len(nuevo_store)} documentos ---")
+    return True
+
+
+def _fusionar(forest_base, store_base, pendientes, secuencia):
+    conservadas = [fila for fila in range(len(store_base)) if store_base.text('ids', fila) not in pendientes]
+    nuevos = [(csv_id, doc) for csv_id, (_, doc) in pendientes.items() if doc is not None]
+
+    registros = [store_base.record(fila) for fila in conservadas]
+    registros.extend((csv_id, doc[0], doc[1]) for csv_id, doc in nuevos)
+    # Firmas completas guardadas: las del almacén o, con firmas compactas,
+    # las claves del forest si no están truncadas (son la firma entera
+    # repartida entre los árboles). Los casi duplicados no tienen firma
+    # guardada, y con claves de 16 bits ninguna fila la tiene: se vuelven a
+    # firmar desde el título.
+    if store_base.firmas is not None:
+        guardadas = store_base.firmas
+    elif forest_base.bits >= 32:
+        guardadas = forest_base.signatures()
+    else:
+        guardadas = np.zeros((0, NUM_PERMUTACIONES), dtype=np.uint32)
+    conservadas = np.array(conservadas, dtype=np.int64)
+    firmadas = conservadas < len(guardadas)
+    firmas_conservadas = np.empty((len(conservadas), NUM_PERMUTACIONES), dtype=np.uint32)
+    firmas_conservadas[firmadas] = guardadas[conservadas[firmadas]]
+    firmas_conservadas[~firmadas] = build_signatures(
+        [make_shingle(store_base.text('titulos', fila)) for fila in conservadas[~firmadas].tolist()], NUM_PERMUTACIONES)
+    firmas = np.concatenate([
+        firmas_conservadas,
+        np.array([doc[2] for _, doc in nuevos], dtype=np.uint32).reshape(len(nuevos), NUM_PERMUTACIONES),
+    ])
+
+    nuevo_indice = _construir_indice(registros, firmas)
+    snapshot = _guardar_snapshot(*nuevo_indice, secuencia) if indice_origen is not None else None
+
+    # Primero se publica el índice nuevo y después se retiran los cambios
+    # del delta, para que ningún documento desaparezca entre medio. Lo
+    # fusionado sale del registro compartido una vez escrito el snapshot.
+    if snapshot is not None:
+        if delta_log is not None:
+            delta_log.compact(secuencia)
+        _publicar_snapshot(snapshot)
+    else:
+        publish_index(*nuevo_indice)
+    delta_segment.discard_merged(pendientes)
+    return nuevo_indice[1]
+
+
+def index_stats():
+    _, store_actual, _, generacion = indice_actual
+    if motor_particionado is not None:
+        return {**motor_particionado.stats(), 'generation': generacion}
+    return {
+        'documents': len(store_actual),
+        'representatives': store_actual.representantes,
+        'pending_changes': len(delta_segment),
+        'generation': generacion,
+        'merging': _merge_lock.locked(),
+    }
+
+
+def _candidatos_lsh(forest, data_store, query_minhash):
+    result_keys = forest.query(query_minhash, k=MAX_CANDIDATES)
+    filas = np.fromiter(result_keys, dtype=np.int64, count=len(result_keys))
+    filas = filas[(filas >= 0) & (filas < len(data_store))]
+
+    # Todas las similitudes de una vez sobre las firmas de los candidatos.
+    return filas, data_store.jaccard(filas, query_minhash.hashvalues)
+
+
+def _candidatos_invertidos(inverted, query_shingle):
+    # Jaccard exacto sobre todas las filas que comparten algún token; se
+    # quedan las MAX_CANDIDATES mejores, ordenadas por fila.
+    filas, similitudes = inverted.search(query_shingle)
+    if len(filas) > MAX_CANDIDATES:
+        mejores = np.sort(np.argpartition(-similitudes, MAX_CANDIDATES - 1)[:MAX_CANDIDATES])
+        filas, similitudes = filas[mejores], similitudes[mejores]
+    return filas, similitudes
+
+
+def _minhash_consulta(query_shingle):
+    # Mismo vocabulario que la construcción del índice: las palabras ya vistas
+    # no se vuelven a hashear.
+    return datasketch.MinHash(NUM_PERMUTACIONES, hashvalues=token_vocabulary(NUM_PERMUTACIONES).signature(query_shingle),
+                              permutations=minhash_permutations(NUM_PERMUTACIONES))
+
+
+def _buscar(forest, data_store, inverted, query_shingle, limit):
+    # Las consultas cortas van al índice invertido: es exacto y más rápido
+    # que recorrer el forest para una o dos palabras.
+    exacta = len(query_shingle) <= SHORT_QUERY_TOKENS and len(inverted) == data_store.representantes
+    if exacta:
+        filas, similitudes = _candidatos_invertidos(inverted, query_shingle)
+    else:
+        filas, similitudes = _candidatos_lsh(forest, data_store, _minhash_consulta(query_shingle))
+
+    validos = similitudes > 0.01
+    filas, similitudes = filas[validos], similitudes[validos]
+
+    # Los ids con cambios pendientes se sirven desde el segmento delta. Si
+    # cambió el representante de un grupo de casi duplicados, lo reemplaza el
+    # primero de los demás que siga igual. Toda la consulta usa la misma
+    # versión del delta aunque lleguen escrituras mientras se arma.
+    ocultos, vivos = delta_segment.view()
+    grupos = [_filas_visibles(data_store, fila, ocultos) for fila in filas.tolist()]
+    visibles = np.array([len(grupo) > 0 for grupo in grupos], dtype=bool)
+    filas, similitudes = filas[visibles], similitudes[visibles]
+    grupos = [grupo for grupo in grupos if grupo]
+    ids_delta, titulos_delta, urls_delta, similitudes_delta = [], [], [], np.zeros(0)
+    if ocultos:
+        # Misma medida que el índice principal: Jaccard exacto si la consulta
+        # fue al índice invertido, estimado con MinHash si fue al forest.
+        if exacta:
+            ids_delta, titulos_delta, urls_delta, similitudes_delta = delta_segment.search_tokens(
+                query_shingle, 0.01, vivos)
+        else:
+            ids_delta, titulos_delta, urls_delta, similitudes_delta = delta_segment.search(
+                _minhash_consulta(query_shingle).hashvalues, 0.01, vivos)
+        similitudes = np.concatenate([similitudes, similitudes_delta])
+
+    # Orden descendente y estable, como el sort anterior; con limit sólo se
+    # ordenan los `limit` mejores elegidos con argpartition.
+    validos = np.arange(len(similitudes))
+    if limit is not None and limit < len(validos):
+        validos = np.sort(np.argpartition(-similitudes, limit - 1)[:limit])
+    orden = validos[np.argsort(-similitudes[validos], kind='stable')]
+
+    lista_resultados = []
+    for posicion in orden.tolist():
+        duplicados = []
+        if posicion < len(filas):
+            grupo = grupos[posicion]
+            csv_id, titulo, url = data_store.record(grupo[0])
+            for fila in grupo[1:]:
+                id_duplicado, titulo_duplicado, url_duplicado = data_store.record(fila)
+                duplicados.append({'id': id_duplicado, 'title': titulo_duplicado, 'url': url_duplicado})
+        else:
+            posicion_delta = posicion - len(filas)
+            csv_id, titulo, url = ids_delta[posicion_delta], titulos_delta[posicion_delta], urls_delta[posicion_delta]
+        lista_resultados.append({
+            'id': csv_id,
+            'title': titulo,
+            'url': url,
+            'similarity': float(similitudes[posicion]),
+            'duplicates': duplicados,
+        })
 
-        if sim > 0.01:
-            lista_resultados.append({
-                'id': csv_id_key,
-                'title': item_similar['title'],
-                'url': item_similar['url'],
-                'similarity': sim
-            })
+    return lista_resultados
 
-    lista_resultados.sort(key=lambda x: x['similarity'], reverse=True)
 
-    return lista_resultados
\ No newline at end of file
+def _filas_visibles(data_store, fila, ocultos):
+    # El representante y sus casi duplicados, sin los que tienen cambios
+    # pendientes en el delta.
+    filas = [fila, *data_store.duplicates(fila)]
+    if ocultos:
+        filas = [fila for fila in filas if data_store.text('ids', fila) not in ocultos]
+    return filas
@@ -0,0 +1,160 @@
+import heapq
+import itertools
+import threading
+import zlib
+from concurrent.futures import Future
+from multiprocessing import get_context
+
+
+def shard_of(csv_id, num_shards):
+    # crc32 y no hash(): tiene que dar lo mismo en todos los procesos.
+    return zlib.crc32(str(csv_id).encode('utf-8')) % num_shards
+
+
+def _servir_shard(conexion):
+    # Bucle de un proceso shard: el propio search_engine con su parte de los
+    # documentos, atendiendo peticiones (id, operación, argumentos) en orden.
+    import search_engine
+
+    operaciones = {
+        'build': search_engine.build_index_from_records,
+        'search': search_engine.run_real_search,
+        'add': search_engine.add_documents,
+        'delete': search_engine.delete_documents,
+        'merge': search_engine.start_background_merge,
+        'stats': search_engine.index_stats,
+        'clear_cache': search_engine.clear_search_cache,
+    }
+    while True:
+        try:
+            mensaje = conexion.recv()
+        except EOFError:
+            break
+        if mensaje is None:
+            break
+
+        id_peticion, operacion, argumentos = mensaje
+        try:
+            respuesta = (True, operaciones[operacion](*argumentos))
+        except Exception as e:
+            respuesta = (False, f"{type(e).__name__}: {e}")
+        conexion.send((id_peticion, respuesta))
+    conexion.close()
+
+
+class _Shard:
+    # Extremo local de un proceso shard. Las peticiones se envían sin esperar
+    # la anterior y un hilo receptor resuelve el Future de cada respuesta, así
+    # varias consultas concurrentes avanzan a la vez en todos los shards.
+
+    def __init__(self, contexto):
+        self.conexion, remota = contexto.Pipe()
+        self.proceso = contexto.Process(target=_servir_shard, args=(remota,), daemon=True)
+        self.proceso.start()
+        remota.close()
+
+        self._pendientes = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._receptor = threading.Thread(target=self._recibir, daemon=True)
+        self._receptor.start()
+
+    def call(self, operacion, *argumentos):
+        futuro = Future()
+        with self._lock:
+            id_peticion = next(self._ids)
+            self._pendientes[id_peticion] = futuro
+            self.conexion.send((id_peticion, operacion, argumentos))
+        return futuro
+
+    def _recibir(self):
+        while True:
+            try:
+                id_peticion, (correcto, valor) = self.conexion.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                futuro = self._pendientes.pop(id_peticion)
+            if correcto:
+                futuro.set_result(valor)
+            else:
+                futuro.set_exception(RuntimeError(valor))
+
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, {}
+        for futuro in pendientes.values():
+            futuro.set_exception(RuntimeError("El proceso del shard terminó."))
+
+    def close(self):
+        try:
+            with self._lock:
+                self.conexion.send(None)
+        except OSError:
+            pass
+        self.proceso.join(timeout=5)
+        if self.proceso.is_alive():
+            self.proceso.terminate()
+        self.conexion.close()
+
+
+class ShardedSearchEngine:
+    # Documentos repartidos por hash del id entre num_shards procesos, cada
+    # uno con su propio índice. Las consultas se envían a todos a la vez y
+    # las listas de cada shard (ya ordenadas) se mezclan con un heap.
+
+    def __init__(self, num_shards):
+        # 'spawn' porque se arranca desde un hilo del servidor.
+        contexto = get_context('spawn')
+        self.shards = [_Shard(contexto) for _ in range(num_shards)]
+
+    def __len__(self):
+        return len(self.shards)
+
+    def _repartir(self, elementos, clave):
+        partes = [[] for _ in self.shards]
+        for elemento in elementos:
+            partes[shard_of(clave(elemento), len(self.shards))].append(elemento)
+        return partes
+
+    def _en_todos(self, operacion, argumentos_por_shard):
+        futuros = [shard.call(operacion, *argumentos)
+                   for shard, argumentos in zip(self.shards, argumentos_por_shard)]
+        return [futuro.result() for futuro in futuros]
+
+    def build(self, registros):
+        partes = self._repartir(registros, lambda registro: registro[0])
+        return sum(self._en_todos('build', [(parte,) for parte in partes]))
+
+    def search(self, query, limit):
+        listas = self._en_todos('search', [(query, limit)] * len(self.shards))
+        fusion = heapq.merge(*listas, key=lambda resultado: -resultado['similarity'])
+        return list(itertools.islice(fusion, limit))
+
+    def add_documents(self, documentos):
+        partes = self._repartir(documentos, lambda documento: documento[0])
+        return sum(self._en_todos('add', [(parte,) for parte in partes]))
+
+    def delete_documents(self, ids):
+        partes = self._repartir(ids, lambda csv_id: csv_id)
+        return sum(self._en_todos('delete', [(parte,) for parte in partes]))
+
+    def start_background_merge(self):
+        return any(self._en_todos('merge', [()] * len(self.shards)))
+
+    def clear_cache(self):
+        self._en_todos('clear_cache', [()] * len(self.shards))
+
+    def stats(self):
+        por_shard = self._en_todos('stats', [()] * len(self.shards))
+        return {
+            'shards': len(self.shards),
+            'documents': sum(stats['documents'] for stats in por_shard),
+            'representatives': sum(stats['representatives'] for stats in por_shard),
+            'pending_changes': sum(stats['pending_changes'] for stats in por_shard),
+            'merging': any(stats['merging'] for stats in por_shard),
+            'per_shard': por_shard,
+        }
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
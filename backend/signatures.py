@@ -0,0 +1,56 @@
+import numpy as np
+
+from vocabulary import HASH_MAXIMO, token_vocabulary
+
+# Documentos por lote: acota la matriz intermedia (tokens del lote x
+# permutaciones) que se reduce a firmas.
+DOCUMENTOS_POR_LOTE = 2048
+
+
+def token_ids(conjuntos):
+    # Cada token distinto recibe un id en orden de aparición; los documentos
+    # quedan como una lista plana de ids con offsets (CSR).
+    vocabulario = {}
+    ids = []
+    longitudes = []
+    for conjunto in conjuntos:
+        ids.extend([vocabulario.setdefault(token, len(vocabulario)) for token in conjunto])
+        longitudes.append(len(conjunto))
+
+    offsets = np.zeros(len(conjuntos) + 1, dtype=np.int64)
+    np.cumsum(longitudes, out=offsets[1:])
+    return vocabulario, np.array(ids, dtype=np.int64), offsets
+
+
+def build_signatures(conjuntos, num_perm, documentos_por_lote=DOCUMENTOS_POR_LOTE, vocabulario=None):
+    # Firmas MinHash de una lista de conjuntos de tokens, idénticas a las de
+    # datasketch.MinHash.update token por token. Los conjuntos vacíos quedan
+    # con el valor inicial de datasketch (HASH_MAXIMO en todas las posiciones).
+    if vocabulario is None:
+        vocabulario = token_vocabulary(num_perm)
+    ids, offsets = vocabulario.intern(conjuntos)
+    return signatures_from_ids(ids, offsets, vocabulario, documentos_por_lote)
+
+
+def signatures_from_ids(ids, offsets, vocabulario, documentos_por_lote=DOCUMENTOS_POR_LOTE):
+    # Lo mismo para documentos ya internados en el vocabulario: ids de sus
+    # tokens como lista plana con offsets (CSR).
+    total = len(offsets) - 1
+    firmas = np.full((total, vocabulario.num_perm), HASH_MAXIMO, dtype=np.uint64)
+    for inicio in range(0, total, documentos_por_lote):
+        fin = min(inicio + documentos_por_lote, total)
+        limites = offsets[inicio:fin + 1]
+        no_vacios = np.flatnonzero(limites[1:] > limites[:-1])
+        if len(no_vacios) == 0:
+            continue
+
+        # Las filas de los tokens distintos del lote salen del vocabulario y
+        # se reparten a sus apariciones. La reducción se hace con las
+        # permutaciones como filas: reduceat sobre el eje contiguo es varias
+        # veces más rápido que sobre el eje 0.
+        distintos, inversos = np.unique(ids[limites[0]:limites[-1]], return_inverse=True)
+        permutados = np.ascontiguousarray(vocabulario.rows(distintos).T).take(inversos, axis=1)
+        minimos = np.minimum.reduceat(permutados, limites[no_vacios] - limites[0], axis=1)
+        firmas[inicio + no_vacios] = minimos.T
+
+    return firmas
@@ -0,0 +1,32 @@
+from delta_log import DeltaLog
+
+
+def test_delta_log_is_shared_between_processes(tmp_path):
+    ruta = str(tmp_path / "indice.snapshot.delta")
+    # Dos instancias sobre el mismo archivo hacen de dos workers.
+    worker_a, worker_b = DeltaLog(ruta), DeltaLog(ruta)
+
+    assert worker_a.append([("1", "receta de pollo", "https://a/1"), ("2", None, None)]) == [
+        (1, "1", "receta de pollo", "https://a/1"), (2, "2", None, None)]
+    # Al escribir, b recibe primero lo que escribió a y sigue la secuencia.
+    assert worker_b.append([("3", "sopa de verduras", "https://b/3")]) == [
+        (1, "1", "receta de pollo", "https://a/1"), (2, "2", None, None), (3, "3", "sopa de verduras", "https://b/3")]
+    assert worker_a.read() == [(3, "3", "sopa de verduras", "https://b/3")]
+    assert worker_a.read() == []
+
+    # Tras fusionar hasta 2, sólo queda lo posterior y nadie vuelve a leer lo
+    # que ya había aplicado.
+    worker_a.compact(2)
+    assert worker_b.read() == []
+    assert DeltaLog(ruta, secuencia=2).read() == [(3, "3", "sopa de verduras", "https://b/3")]
+    worker_b.append([("4", None, None)])
+    assert worker_a.read() == [(4, "4", None, None)]
+    assert worker_a.base == 2 and worker_a.secuencia == 4
+
+
+def test_new_delta_log_continues_the_snapshot_sequence(tmp_path):
+    ruta = str(tmp_path / "indice.snapshot.delta")
+    worker = DeltaLog(ruta, secuencia=10)
+    assert worker.read() == []
+    assert worker.append([("1", "titulo", "https://a/1")]) == [(11, "1", "titulo", "https://a/1")]
+    assert DeltaLog(ruta).read() == [(11, "1", "titulo", "https://a/1")]
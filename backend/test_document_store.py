@@ -0,0 +1,71 @@
+import gc
+import tracemalloc
+
+import numpy as np
+from datasketch import MinHash
+
+from document_store import DocumentStore
+from signatures import build_signatures
+from tokenizer import make_shingle
+
+NUM_PERMUTACIONES = 128
+NUM_DOCUMENTOS = 500
+
+
+def _registros():
+    generador = np.random.default_rng(0)
+    palabras = [f"palabra{i}" for i in range(5000)]
+    return [(str(fila),
+             " ".join(generador.choice(palabras, size=8)),
+             f"https://ejemplo.com/noticias/{fila}/articulo.html")
+            for fila in range(NUM_DOCUMENTOS)]
+
+
+def _memoria(construir):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        antes = tracemalloc.get_traced_memory()[0]
+        resultado = construir()
+        despues = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del resultado
+    return despues - antes
+
+
+def _diccionario_de_minhash(registros, shingles):
+    # El data_store anterior: un dict por documento con su propio MinHash.
+    almacen = {}
+    for (csv_id, titulo, url), shingle in zip(registros, shingles):
+        minhash = MinHash(num_perm=NUM_PERMUTACIONES)
+        for token in shingle:
+            minhash.update(token.encode('utf-8'))
+        almacen[csv_id] = {'title': titulo, 'url': url, 'minhash': minhash}
+    return almacen
+
+
+def test_document_store_uses_five_times_less_memory_per_document():
+    registros = _registros()
+    shingles = [make_shingle(titulo) for _, titulo, _ in registros]
+    firmas = build_signatures(shingles, NUM_PERMUTACIONES)
+
+    diccionario = _memoria(lambda: _diccionario_de_minhash(registros, shingles))
+    almacen = _memoria(lambda: DocumentStore.from_records(registros, firmas, NUM_PERMUTACIONES))
+
+    assert diccionario / almacen >= 5, (f"dict de MinHash: {diccionario / NUM_DOCUMENTOS:.0f} B/doc, "
+                                        f"DocumentStore: {almacen / NUM_DOCUMENTOS:.0f} B/doc")
+
+
+def test_document_store_keeps_the_signatures():
+    registros = _registros()[:50]
+    shingles = [make_shingle(titulo) for _, titulo, _ in registros]
+    almacen = DocumentStore.from_records(registros, build_signatures(shingles, NUM_PERMUTACIONES), NUM_PERMUTACIONES)
+
+    for fila, ((csv_id, titulo, url), shingle) in enumerate(zip(registros, shingles)):
+        minhash = MinHash(num_perm=NUM_PERMUTACIONES)
+        for token in shingle:
+            minhash.update(token.encode('utf-8'))
+        documento = almacen.get(fila)
+        assert (documento['id'], documento['title'], documento['url']) == (csv_id, titulo, url)
+        assert np.array_equal(documento['minhash'].hashvalues, minhash.hashvalues)
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+import search_engine
+from sharded_engine import ShardedSearchEngine
+
+NUM_DOCUMENTOS = 300
+LIMITE = 50
+
+
+def _registros():
+    # Títulos de palabras al azar de un vocabulario grande: no hay casi
+    # duplicados, así que agrupar por shard o en todo el corpus da lo mismo.
+    generador = np.random.default_rng(1)
+    palabras = [f"palabra{i}" for i in range(2000)]
+    return [(str(fila), " ".join(generador.choice(palabras, size=8, replace=False)), f"https://ejemplo.com/{fila}")
+            for fila in range(NUM_DOCUMENTOS)]
+
+
+def _resultados(resultados):
+    return sorted((resultado['id'], resultado['similarity']) for resultado in resultados)
+
+
+@pytest.fixture(scope='module')
+def motores():
+    registros = _registros()
+    search_engine.build_index_from_records(registros)
+    motor = ShardedSearchEngine(2)
+    try:
+        motor.build(registros)
+        yield registros, motor
+    finally:
+        motor.close()
+
+
+def test_sharded_engine_matches_the_unsharded_index(motores):
+    registros, motor = motores
+    for _, titulo, _ in registros[:20]:
+        palabras = titulo.split()
+        # Una o dos palabras van al índice invertido (Jaccard exacto): la
+        # mezcla de shards tiene que dar exactamente los mismos resultados.
+        for consulta in (palabras[0], " ".join(palabras[2:4])):
+            assert _resultados(motor.search(consulta, LIMITE)) == _resultados(
+                search_engine.run_real_search(consulta, LIMITE))
+        # El título completo va al forest: cada shard pide sus propios
+        # candidatos, pero el documento mismo sale primero en ambos.
+        assert motor.search(titulo, LIMITE)[0]['id'] == search_engine.run_real_search(titulo, LIMITE)[0]['id']
+
+
+def test_sharded_engine_applies_changes_like_the_unsharded_index(motores):
+    registros, motor = motores
+    nuevos = [("nuevo-1", "receta de pollo con arroz", "https://ejemplo.com/nuevo-1"),
+              (registros[5][0], "sopa de verduras", "https://ejemplo.com/5")]
+    borrados = [registros[7][0], registros[8][0]]
+    for motor_actual in (motor, search_engine):
+        motor_actual.add_documents(nuevos)
+        motor_actual.delete_documents(borrados)
+
+    for consulta in ("pollo", "sopa verduras", registros[5][1].split()[0], registros[7][1].split()[0],
+                     registros[8][1]):
+        assert _resultados(motor.search(consulta, LIMITE)) == _resultados(
+            search_engine.run_real_search(consulta, LIMITE))
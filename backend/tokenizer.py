@@ -0,0 +1,5 @@
+def make_shingle(text: str):
+    if not text:
+        return set()
+    text = str(text).lower()
+    return set(text.split())
@@ -0,0 +1,129 @@
+import threading
+from functools import lru_cache
+
+import numpy as np
+from datasketch import MinHash
+from datasketch.hashfunc import sha1_hash32
+
+# Mismas constantes que datasketch.MinHash: cada permutación es
+# (a * h + b) mod (2^61 - 1) truncada a 32 bits, con aritmética uint64.
+PRIMO_MERSENNE = np.uint64((1 << 61) - 1)
+HASH_MAXIMO = np.uint64((1 << 32) - 1)
+
+# Tokens que las consultas pueden agregar como máximo: con 128 permutaciones
+# cada uno ocupa 512 bytes y las consultas traen palabras arbitrarias. Pasado
+# el tope, los tokens desconocidos de una consulta se permutan sin guardarlos.
+VOCABULARIO_MAXIMO = 1 << 17
+
+
+@lru_cache(maxsize=None)
+def minhash_permutations(num_perm):
+    # Los parámetros (a, b) que usa datasketch con su semilla por defecto.
+    # Generarlos cuesta más que hashear una consulta, así que se guardan.
+    return MinHash(num_perm=num_perm).permutations
+
+
+def permute_hashes(hashes, permutaciones):
+    # Matriz (num_perm, len(hashes)): una fila por permutación.
+    a, b = permutaciones
+    return np.bitwise_and((a[:, None] * hashes + b[:, None]) % PRIMO_MERSENNE, HASH_MAXIMO)
+
+
+def permute_tokens(tokens, permutaciones):
+    # Filas de hashes permutados (len(tokens), num_perm) uint32, una por token.
+    hashes = np.fromiter((sha1_hash32(token.encode('utf-8')) for token in tokens),
+                         dtype=np.uint64, count=len(tokens))
+    return permute_hashes(hashes, permutaciones).T.astype(np.uint32)
+
+
+class TokenVocabulary:
+    # Tokens internados a ids enteros, con los num_perm hashes permutados de
+    # cada uno ya calculados (uint32, una fila por token). Cada palabra se
+    # codifica y hashea una sola vez por proceso; las firmas son mínimos
+    # sobre filas de esta tabla.
+
+    def __init__(self, num_perm, max_tokens=VOCABULARIO_MAXIMO):
+        self.num_perm = num_perm
+        self.max_tokens = max_tokens
+        self.permutaciones = minhash_permutations(num_perm)
+        self.ids = {}
+        self.tokens = []
+        self._filas = np.empty((1024, num_perm), dtype=np.uint32)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _permutar(self, tokens):
+        return permute_tokens(tokens, self.permutaciones)
+
+    def _agregar(self, tokens, limite=None):
+        # Sólo con el lock tomado. Devuelve los tokens que no entraron.
+        nuevos = [token for token in dict.fromkeys(tokens) if token not in self.ids]
+        sobrantes = []
+        if limite is not None:
+            sobrantes = nuevos[max(0, limite - len(self.ids)):]
+            nuevos = nuevos[:len(nuevos) - len(sobrantes)]
+        if nuevos:
+            self._guardar(nuevos, self._permutar(nuevos))
+        return sobrantes
+
+    def _guardar(self, nuevos, filas_nuevas):
+        # Sólo con el lock tomado, para tokens que no están en el vocabulario.
+        necesarios = len(self.ids) + len(nuevos)
+        if necesarios > len(self._filas):
+            capacidad = max(necesarios, 2 * len(self._filas))
+            filas = np.empty((capacidad, self.num_perm), dtype=np.uint32)
+            filas[:len(self.ids)] = self._filas[:len(self.ids)]
+            self._filas = filas
+        self._filas[len(self.ids):necesarios] = filas_nuevas
+        for token in nuevos:
+            self.ids[token] = len(self.ids)
+        self.tokens.extend(nuevos)
+
+    def add(self, tokens, filas):
+        # Agrega tokens nuevos con sus filas de hashes permutados ya
+        # calculadas en otro proceso (permute_tokens).
+        with self._lock:
+            self._guardar(list(tokens), filas)
+
+    def intern(self, conjuntos):
+        # ids de los tokens de cada conjunto como lista plana con offsets
+        # (CSR), agregando al vocabulario los que falten. Los documentos
+        # indexados no tienen tope: su vocabulario es el del corpus.
+        with self._lock:
+            self._agregar([token for conjunto in conjuntos for token in conjunto])
+            ids = np.fromiter((self.ids[token] for conjunto in conjuntos for token in conjunto),
+                              dtype=np.int64)
+        offsets = np.zeros(len(conjuntos) + 1, dtype=np.int64)
+        np.cumsum([len(conjunto) for conjunto in conjuntos], out=offsets[1:])
+        return ids, offsets
+
+    def rows(self, ids):
+        # Filas de hashes permutados, (len(ids), num_perm). Se lee la tabla
+        # actual sin lock: crecer sólo reemplaza el array y las filas ya
+        # escritas no cambian.
+        return self._filas[ids]
+
+    def table(self):
+        # Vista de la tabla completa (len(self), num_perm), fila i = token i.
+        return self._filas[:len(self.ids)]
+
+    def signature(self, tokens):
+        # Firma MinHash (uint64, como datasketch) de un conjunto de tokens.
+        tokens = list(tokens)
+        with self._lock:
+            sobrantes = self._agregar(tokens, self.max_tokens)
+            filas = self._filas[[self.ids[token] for token in tokens if token in self.ids]]
+        if sobrantes:
+            filas = np.concatenate([filas, self._permutar(sobrantes)])
+        if len(filas) == 0:
+            return np.full(self.num_perm, HASH_MAXIMO, dtype=np.uint64)
+        return filas.min(axis=0).astype(np.uint64)
+
+
+@lru_cache(maxsize=None)
+def token_vocabulary(num_perm):
+    # Un vocabulario por proceso y número de permutaciones, compartido entre
+    # la construcción del índice, las altas y las consultas.
+    return TokenVocabulary(num_perm)
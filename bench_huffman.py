@@ -0,0 +1,251 @@
+import argparse
+import bz2
+import json
+import lzma
+import os
+import platform
+import resource
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from huffman import HuffmanCompressor, VERSION_BLOQUES, FORMATO_ENTRADA_INDICE, FORMATO_PIE
+
+CSV_FILE = 'scanned_urls_202510192249.csv'
+ESCALAS = [1, 10, 100]
+TAMANO_FRAGMENTO = 1 << 20
+
+# Rutas del .ziphuff: método de compresión del HuffmanCompressor y cómo se
+# lee de vuelta.
+RUTAS_ZIPHUFF = {
+    'stream': 'compress',
+    'bloques': 'compress_blocks',
+    'bytes': 'compress_bytes',
+}
+
+BASELINES = {
+    'zlib': (lambda: zlib.compressobj(6), zlib.decompressobj),
+    'lzma': (lzma.LZMACompressor, lzma.LZMADecompressor),
+    'bz2': (bz2.BZ2Compressor, bz2.BZ2Decompressor),
+}
+
+
+def pico_rss_bytes():
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KiB, macOS bytes.
+    return pico if sys.platform == 'darwin' else pico * 1024
+
+
+def crear_copia_escalada(ruta_csv, escala, directorio):
+    # La cabecera del CSV una vez y las filas de datos repetidas `escala` veces.
+    ruta_salida = os.path.join(directorio, f"urls_x{escala}.csv")
+    with open(ruta_csv, 'rb') as f:
+        cabecera = f.readline()
+        filas = f.read()
+
+    with open(ruta_salida, 'wb') as f_out:
+        f_out.write(cabecera)
+        for _ in range(escala):
+            f_out.write(filas)
+            if not filas.endswith(b"\n"):
+                f_out.write(b"\n")
+
+    return ruta_salida
+
+
+def tamano_cabecera_ziphuff(ruta_comprimido):
+    compresor = HuffmanCompressor()
+    with open(ruta_comprimido, 'rb') as f:
+        version, _ = compresor._leer_cabecera(f)
+        if version != VERSION_BLOQUES:
+            # Tabla de códigos más el byte de padding.
+            return f.tell() + 1
+
+        tamano = f.tell()
+        indice = compresor._leer_indice(f)
+        return tamano + len(indice) * struct.calcsize(FORMATO_ENTRADA_INDICE) + struct.calcsize(FORMATO_PIE)
+
+
+def medir_compresion_ziphuff(ruta, ruta_ziphuff, num_workers):
+    compresor = HuffmanCompressor(num_workers)
+    metodo = getattr(compresor, RUTAS_ZIPHUFF[ruta_ziphuff])
+    rss_inicial = pico_rss_bytes()
+
+    inicio = time.perf_counter()
+    ruta_comprimido, _ = metodo(ruta)
+    segundos = time.perf_counter() - inicio
+    if ruta_comprimido is None:
+        raise RuntimeError(f"Falló la compresión '{ruta_ziphuff}' de {ruta}")
+
+    destino = f"{ruta}.{ruta_ziphuff}.ziphuff"
+    os.replace(ruta_comprimido, destino)
+    return {
+        'segundos': segundos,
+        'rss_inicial': rss_inicial,
+        'rss_pico': pico_rss_bytes(),
+        'ruta': destino,
+    }
+
+
+def medir_descompresion_ziphuff(ruta_comprimido, num_workers):
+    compresor = HuffmanCompressor(num_workers)
+    rss_inicial = pico_rss_bytes()
+
+    # Se consume el stream sin acumular el resultado para medir sólo al
+    # decodificador, no el coste de guardar el texto completo.
+    inicio = time.perf_counter()
+    with open(ruta_comprimido, 'rb') as f:
+        for _ in compresor.decompress_stream(f):
+            pass
+    segundos = time.perf_counter() - inicio
+
+    return {'segundos': segundos, 'rss_inicial': rss_inicial, 'rss_pico': pico_rss_bytes()}
+
+
+def medir_compresion_baseline(ruta, nombre):
+    crear_compresor, _ = BASELINES[nombre]
+    destino = f"{ruta}.{nombre}"
+    rss_inicial = pico_rss_bytes()
+
+    inicio = time.perf_counter()
+    compresor = crear_compresor()
+    with open(ruta, 'rb') as f_in, open(destino, 'wb') as f_out:
+        fragmento = f_in.read(TAMANO_FRAGMENTO)
+        while fragmento:
+            f_out.write(compresor.compress(fragmento))
+            fragmento = f_in.read(TAMANO_FRAGMENTO)
+        f_out.write(compresor.flush())
+    segundos = time.perf_counter() - inicio
+
+    return {
+        'segundos': segundos,
+        'rss_inicial': rss_inicial,
+        'rss_pico': pico_rss_bytes(),
+        'ruta': destino,
+    }
+
+
+def medir_descompresion_baseline(ruta_comprimido, nombre):
+    _, crear_descompresor = BASELINES[nombre]
+    rss_inicial = pico_rss_bytes()
+
+    inicio = time.perf_counter()
+    descompresor = crear_descompresor()
+    with open(ruta_comprimido, 'rb') as f:
+        fragmento = f.read(TAMANO_FRAGMENTO)
+        while fragmento:
+            descompresor.decompress(fragmento)
+            fragmento = f.read(TAMANO_FRAGMENTO)
+    segundos = time.perf_counter() - inicio
+
+    return {'segundos': segundos, 'rss_inicial': rss_inicial, 'rss_pico': pico_rss_bytes()}
+
+
+def en_proceso_nuevo(funcion, *argumentos):
+    # Cada medición corre en un proceso recién creado para que el pico de RSS
+    # sea sólo el suyo y no arrastre memoria de mediciones anteriores.
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as ejecutor:
+        return ejecutor.submit(funcion, *argumentos).result()
+
+
+def mejor_de(repeticiones, funcion, *argumentos):
+    resultados = [en_proceso_nuevo(funcion, *argumentos) for _ in range(repeticiones)]
+    return min(resultados, key=lambda resultado: resultado['segundos'])
+
+
+def resumir(codec, escala, tamano_original, compresion, descompresion, tamano_cabecera):
+    tamano_comprimido = os.path.getsize(compresion['ruta'])
+    megabytes = tamano_original / 1e6
+    return {
+        'codec': codec,
+        'escala': escala,
+        'bytes_original': tamano_original,
+        'bytes_comprimido': tamano_comprimido,
+        'bytes_cabecera': tamano_cabecera,
+        'ratio': tamano_comprimido / tamano_original,
+        'compresion_segundos': compresion['segundos'],
+        'compresion_mb_s': megabytes / compresion['segundos'],
+        'compresion_rss_pico': compresion['rss_pico'],
+        'compresion_rss_inicial': compresion['rss_inicial'],
+        'descompresion_segundos': descompresion['segundos'],
+        'descompresion_mb_s': megabytes / descompresion['segundos'],
+        'descompresion_rss_pico': descompresion['rss_pico'],
+        'descompresion_rss_inicial': descompresion['rss_inicial'],
+    }
+
+
+def ejecutar(ruta_csv, escalas, codecs, repeticiones, num_workers, directorio):
+    resultados = []
+    for escala in escalas:
+        ruta = crear_copia_escalada(ruta_csv, escala, directorio)
+        tamano_original = os.path.getsize(ruta)
+        print(f"--- Escala x{escala}: {tamano_original:,} bytes ---")
+
+        for codec in codecs:
+            if codec in RUTAS_ZIPHUFF:
+                compresion = mejor_de(repeticiones, medir_compresion_ziphuff, ruta, codec, num_workers)
+                descompresion = mejor_de(repeticiones, medir_descompresion_ziphuff, compresion['ruta'], num_workers)
+                tamano_cabecera = tamano_cabecera_ziphuff(compresion['ruta'])
+            else:
+                compresion = mejor_de(repeticiones, medir_compresion_baseline, ruta, codec)
+                descompresion = mejor_de(repeticiones, medir_descompresion_baseline, compresion['ruta'], codec)
+                tamano_cabecera = None
+
+            resumen = resumir(codec, escala, tamano_original, compresion, descompresion, tamano_cabecera)
+            resultados.append(resumen)
+            os.remove(compresion['ruta'])
+
+            print(f"{codec:>8}  ratio {resumen['ratio']:.3f}  "
+                  f"comp {resumen['compresion_mb_s']:7.2f} MB/s  "
+                  f"descomp {resumen['descompresion_mb_s']:7.2f} MB/s  "
+                  f"RSS pico {resumen['compresion_rss_pico'] / 2**20:.0f}/"
+                  f"{resumen['descompresion_rss_pico'] / 2**20:.0f} MiB")
+
+        os.remove(ruta)
+
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del códec .ziphuff frente a zlib/lzma/bz2.")
+    parser.add_argument('--csv', default=CSV_FILE)
+    parser.add_argument('--escalas', type=int, nargs='+', default=ESCALAS)
+    parser.add_argument('--codecs', nargs='+', default=list(RUTAS_ZIPHUFF) + list(BASELINES),
+                        choices=list(RUTAS_ZIPHUFF) + list(BASELINES))
+    parser.add_argument('--repeticiones', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--directorio', default=None,
+                        help="Directorio para las copias escaladas (por defecto uno temporal).")
+    parser.add_argument('--salida', default='bench_huffman.json')
+    args = parser.parse_args()
+
+    directorio = args.directorio or tempfile.mkdtemp(prefix='bench_huffman_')
+    os.makedirs(directorio, exist_ok=True)
+    try:
+        resultados = ejecutar(args.csv, args.escalas, args.codecs, args.repeticiones, args.workers, directorio)
+    finally:
+        if args.directorio is None:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    informe = {
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'csv': os.path.abspath(args.csv),
+        'repeticiones': args.repeticiones,
+        'workers': args.workers,
+        'resultados': resultados,
+    }
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=2)
+
+    print(f"Resultados guardados en '{args.salida}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,201 +1,1129 @@
-import os
-import heapq
-import json
-import struct
-from collections import Counter
-
-class NodoHuffman:
-    def __init__(self, char, freq):
-        self.char = char
-        self.freq = freq
-        self.left = None
-        self.right = None
-
-    def __lt__(self, other):
-        return self.freq < other.freq
-
-    def __eq__(self, other):
-        if not isinstance(other, NodoHuffman):
-            return False
-        return self.freq == other.freq
-
-class HuffmanCompressor:
-    
-    def __init__(self):
-        self.codigos = {}
-        self.arbol = None
-
-    def _calcular_frecuencias(self, texto):
-        return Counter(texto)
-
-    def _construir_arbol(self, frecuencias):
-        cola_prioridad = [NodoHuffman(char, freq) for char, freq in frecuencias.items()]
-        heapq.heapify(cola_prioridad)
-
-        while len(cola_prioridad) > 1:
-            nodo_izq = heapq.heappop(cola_prioridad)
-            nodo_der = heapq.heappop(cola_prioridad)
-
-            freq_suma = nodo_izq.freq + nodo_der.freq
-            nodo_padre = NodoHuffman(None, freq_suma)
-            nodo_padre.left = nodo_izq
-            nodo_padre.right = nodo_der
-
-            heapq.heappush(cola_prioridad, nodo_padre)
-        
-        self.arbol = cola_prioridad[0]
-
-    def _generar_codigos_recursivo(self, nodo_actual, codigo_actual):
-        if nodo_actual is None:
-            return
-
-        if nodo_actual.char is not None:
-            self.codigos[nodo_actual.char] = codigo_actual or "0"
-            return
-
-        self._generar_codigos_recursivo(nodo_actual.left, codigo_actual + "0")
-        self._generar_codigos_recursivo(nodo_actual.right, codigo_actual + "1")
-
-    def _generar_codigos_completos(self):
-        self.codigos = {}
-        self._generar_codigos_recursivo(self.arbol, "")
-
-    def _get_texto_codificado(self, texto):
-        return "".join([self.codigos[char] for char in texto])
-
-    def _empaquetar_bits(self, texto_codificado):
-        padding = (8 - len(texto_codificado) % 8) % 8
-        texto_codificado += "0" * padding
-        
-        info_padding_byte = bytes([padding])
-        
-        bytes_comprimidos = bytearray()
-        for i in range(0, len(texto_codificado), 8):
-            byte = texto_codificado[i:i+8]
-            bytes_comprimidos.append(int(byte, 2))
-            
-        return info_padding_byte + bytes_comprimidos
-
-    def _serializar_arbol(self):
-        header_json = json.dumps(self.codigos)
-        header_bytes = header_json.encode('utf-8')
-        
-        header_len = struct.pack('I', len(header_bytes))
-        return header_len + header_bytes
-
-    def compress(self, ruta_archivo):
-        ruta_salida = ruta_archivo + ".ziphuff"
-        
-        try:
-            with open(ruta_archivo, 'r', encoding='utf-8') as f:
-                texto = f.read()
-            
-            if not texto:
-                raise ValueError("El archivo está vacío.")
-                
-            frecuencias = self._calcular_frecuencias(texto)
-            
-            self._construir_arbol(frecuencias)
-            
-            self._generar_codigos_completos()
-            
-            texto_codificado = self._get_texto_codificado(texto)
-            
-            ruta_debug = ruta_archivo + ".debug_bits.txt"
-            try:
-                with open(ruta_debug, 'w', encoding='utf-8') as f_debug:
-                    f_debug.write(texto_codificado)
-            except Exception as e_debug:
-                print(f"No se pudo escribir el archivo debug: {e_debug}")
-            
-            datos_comprimidos = self._empaquetar_bits(texto_codificado)
-            
-            header = self._serializar_arbol()
-            
-            with open(ruta_salida, 'wb') as f_out:
-                f_out.write(header)
-                f_out.write(datos_comprimidos)
-                
-            return ruta_salida, self.codigos
-
-        except Exception as e:
-            print(f"Error en compresión: {e}")
-            return None, None
-
-    def decompress_to_string(self, ruta_archivo_comprimido):
-            with open(ruta_archivo_comprimido, 'rb') as f:
-                header_len_bytes = f.read(4)
-                header_len = struct.unpack('I', header_len_bytes)[0]
-
-                header_json_bytes = f.read(header_len)
-                header_json = header_json_bytes.decode('utf-8')
-                codigos = json.loads(header_json)
-
-                codigos_inversos = {v: k for k, v in codigos.items()}
-
-                info_padding_byte = f.read(1)
-                padding = info_padding_byte[0]
-
-                datos_comprimidos = f.read()
-
-                bit_string = ""
-                for byte in datos_comprimidos:
-                    bit_string += f"{byte:08b}"
-
-                if padding > 0:
-                    bit_string = bit_string[:-padding]
-
-                texto_decodificado = ""
-                codigo_actual = ""
-                for bit in bit_string:
-                    codigo_actual += bit
-                    if codigo_actual in codigos_inversos:
-                        texto_decodificado += codigos_inversos[codigo_actual]
-                        codigo_actual = ""
-
-            return texto_decodificado
-
-
-
-    def decompress(self, ruta_archivo_comprimido):
-        ruta_salida = ruta_archivo_comprimido.replace(".ziphuff", "_descomprimido.txt")
-        
-        try:
-            with open(ruta_archivo_comprimido, 'rb') as f:
-                header_len_bytes = f.read(4)
-                header_len = struct.unpack('I', header_len_bytes)[0]
-                
-                header_json_bytes = f.read(header_len)
-                header_json = header_json_bytes.decode('utf-8')
-                codigos = json.loads(header_json)
-                
-                codigos_inversos = {v: k for k, v in codigos.items()}
-                
-                info_padding_byte = f.read(1)
-                padding = info_padding_byte[0]
-                
-                datos_comprimidos = f.read()
-                
-                bit_string = ""
-                for byte in datos_comprimidos:
-                    bit_string += f"{byte:08b}"
-                
-                if padding > 0:
-                    bit_string = bit_string[:-padding]
-                
-                texto_decodificado = ""
-                codigo_actual = ""
-                for bit in bit_string:
-                    codigo_actual += bit
-                    if codigo_actual in codigos_inversos:
-                        texto_decodificado += codigos_inversos[codigo_actual]
-                        codigo_actual = ""
-                        
-            with open(ruta_salida, 'w', encoding='utf-8') as f_out:
-                f_out.write(texto_decodificado)
-                
-            return ruta_salida
-            
-        except Exception as e:
-            print(f"Error en descompresión: {e}")
-            return None
\ No newline at end of file
+import os
+import codecs
+import heapq
+import json
+import csv
+import io
+import mmap
+import struct
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import chain
+
+import numpy as np
+
+# Cabecera binaria (little-endian) de los .ziphuff con códigos canónicos.
+# Los archivos sin esta firma son del formato anterior, con el diccionario
+# de códigos en JSON precedido de su longitud.
+MAGIA_ZIPHUFF = b"ZHUF"
+VERSION_JSON = 1
+VERSION_CANONICA = 2
+
+# Contenedor por bloques: tras la cabecera van los bloques, cada uno
+# decodificable por separado, y al final un índice con una entrada por
+# bloque y un pie de tamaño fijo que indica dónde empieza el índice.
+VERSION_BLOQUES = 3
+FILAS_POR_BLOQUE = 1000
+FORMATO_ENTRADA_INDICE = '<QIBQIQ'
+FORMATO_PIE = '<QI4s'
+
+# Modo binario: alfabeto de 256 símbolos (bytes) en lugar de caracteres.
+VERSION_BYTES = 4
+
+# Modo por columnas para el CSV id,url,title del crawler: cada columna se
+# guarda en secciones comprimidas por separado, listadas en un directorio al
+# final del archivo (mismo pie que el contenedor por bloques).
+VERSION_COLUMNAS = 5
+COLUMNAS_CSV = ['id', 'url', 'title']
+FORMATO_ENTRADA_SECCION = '<16sQQ'
+SEPARADOR_VALORES = "\x00"
+# Los ids se guardan como diferencias en zigzag y varints de 64 bits: con
+# |id| < 2^62 ninguna diferencia se pasa.
+ID_MAXIMO = 1 << 62
+
+NOMBRES_VERSIONES = {
+    VERSION_JSON: "JSON",
+    VERSION_CANONICA: "canónico",
+    VERSION_BLOQUES: "por bloques",
+    VERSION_BYTES: "binario",
+    VERSION_COLUMNAS: "por columnas",
+}
+
+EntradaIndice = namedtuple(
+    'EntradaIndice', ['offset', 'longitud', 'padding', 'primera_fila', 'num_filas', 'offset_tabla'])
+
+# Caracteres (al comprimir) o bytes (al descomprimir) procesados por paso en
+# las APIs de streaming; acota la memoria usada sin importar el tamaño total.
+TAMANO_FRAGMENTO = 1 << 20
+
+class NodoHuffman:
+    def __init__(self, char, freq):
+        self.char = char
+        self.freq = freq
+        self.left = None
+        self.right = None
+
+    def __lt__(self, other):
+        return self.freq < other.freq
+
+    def __eq__(self, other):
+        if not isinstance(other, NodoHuffman):
+            return False
+        return self.freq == other.freq
+
+# Funciones de nivel de módulo para que los procesos del pool puedan
+# recibirlas; en modo secuencial se llaman directamente.
+def _contar_frecuencias(fragmento):
+    return Counter(fragmento)
+
+
+def _codificar_texto(codigos, texto):
+    compresor = HuffmanCompressor()
+    compresor.codigos = codigos
+    return compresor._codificar_bloque(texto)
+
+
+_TABLAS_DECODIFICACION = {}
+
+
+def _decodificar_bloque(codigos, datos, padding):
+    # Cada proceso construye la tabla de una misma tabla de códigos una sola
+    # vez y la reutiliza para el resto de bloques que la comparten.
+    clave = frozenset(codigos.items())
+    if clave not in _TABLAS_DECODIFICACION:
+        if len(_TABLAS_DECODIFICACION) >= 8:
+            _TABLAS_DECODIFICACION.clear()
+        compresor = HuffmanCompressor()
+        _TABLAS_DECODIFICACION[clave] = (compresor._construir_tabla_decodificacion(codigos),
+                                         compresor._texto_vacio(codigos))
+    tabla, vacio = _TABLAS_DECODIFICACION[clave]
+    return HuffmanCompressor()._decodificar_datos(datos, padding, tabla, vacio)
+
+
+def encode_varints(valores):
+    # Enteros no negativos de hasta 64 bits en grupos de 7 bits, el bit alto
+    # marca continuación. Devuelve los bytes (uint8) y cuántos ocupa cada
+    # valor.
+    valores = np.asarray(valores, dtype=np.uint64)
+    # Bytes por valor: uno cada 7 bits significativos, mínimo uno.
+    longitudes = np.ones(len(valores), dtype=np.int64)
+    resto = valores >> np.uint64(7)
+    while resto.any():
+        longitudes += resto > 0
+        resto >>= np.uint64(7)
+
+    finales = np.cumsum(longitudes)
+    inicios = finales - longitudes
+    salida = np.zeros(int(finales[-1]) if len(finales) else 0, dtype=np.uint8)
+    for byte in range(int(longitudes.max()) if len(longitudes) else 0):
+        activos = np.flatnonzero(longitudes > byte)
+        grupo = (valores[activos] >> np.uint64(7 * byte)) & np.uint64(0x7F)
+        continuacion = np.where(longitudes[activos] - 1 > byte, 0x80, 0).astype(np.uint64)
+        salida[inicios[activos] + byte] = grupo | continuacion
+    return salida, longitudes
+
+
+def decode_varints(datos):
+    # Inversa de encode_varints, sobre bytes o un array uint8.
+    datos = np.frombuffer(datos, dtype=np.uint8)
+    if len(datos) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    finales = np.flatnonzero(datos < 0x80)
+    inicios = np.empty_like(finales)
+    inicios[0] = 0
+    inicios[1:] = finales[:-1] + 1
+    # Posición de cada byte dentro de su varint, para desplazarlo 7 * pos.
+    posicion = np.arange(len(datos)) - np.repeat(inicios, finales - inicios + 1)
+    grupos = (datos & 0x7F).astype(np.uint64) << (np.uint64(7) * posicion.astype(np.uint64))
+    return np.add.reduceat(grupos, inicios)
+
+
+def _zigzag(valor):
+    return valor * 2 if valor >= 0 else -valor * 2 - 1
+
+
+def _deszigzag(valor):
+    return valor // 2 if valor % 2 == 0 else -(valor + 1) // 2
+
+
+def _prefijo_comun(a, b):
+    # Búsqueda binaria comparando rebanadas, que se comparan en C, en lugar
+    # de recorrer carácter a carácter.
+    bajo, alto = 0, min(len(a), len(b))
+    while bajo < alto:
+        medio = (bajo + alto + 1) // 2
+        if a[:medio] == b[:medio]:
+            bajo = medio
+        else:
+            alto = medio - 1
+    return bajo
+
+
+class HuffmanCompressor:
+    
+    def __init__(self, num_workers=1):
+        self.codigos = {}
+        self.arbol = None
+        # Con más de un worker, frecuencias, codificación y decodificación de
+        # bloques se reparten en un ProcessPoolExecutor; None usa todos los
+        # núcleos disponibles.
+        self.num_workers = num_workers or os.cpu_count() or 1
+
+    def _ejecutor(self):
+        if self.num_workers > 1:
+            return ProcessPoolExecutor(max_workers=self.num_workers)
+        return nullcontext()
+
+    def _mapear(self, ejecutor, funcion, tareas):
+        # Resultados en el mismo orden que las tareas, con un número acotado
+        # de tareas en vuelo para no leer toda la entrada por adelantado.
+        if ejecutor is None:
+            for argumentos in tareas:
+                yield funcion(*argumentos)
+            return
+
+        pendientes = deque()
+        for argumentos in tareas:
+            pendientes.append(ejecutor.submit(funcion, *argumentos))
+            if len(pendientes) >= 2 * self.num_workers:
+                yield pendientes.popleft().result()
+        while pendientes:
+            yield pendientes.popleft().result()
+
+    def _calcular_frecuencias(self, texto):
+        return Counter(texto)
+
+    def _construir_arbol(self, frecuencias):
+        cola_prioridad = [NodoHuffman(char, freq) for char, freq in frecuencias.items()]
+        heapq.heapify(cola_prioridad)
+
+        while len(cola_prioridad) > 1:
+            nodo_izq = heapq.heappop(cola_prioridad)
+            nodo_der = heapq.heappop(cola_prioridad)
+
+            freq_suma = nodo_izq.freq + nodo_der.freq
+            nodo_padre = NodoHuffman(None, freq_suma)
+            nodo_padre.left = nodo_izq
+            nodo_padre.right = nodo_der
+
+            heapq.heappush(cola_prioridad, nodo_padre)
+        
+        self.arbol = cola_prioridad[0]
+
+    def _generar_codigos_recursivo(self, nodo_actual, codigo_actual):
+        if nodo_actual is None:
+            return
+
+        if nodo_actual.char is not None:
+            self.codigos[nodo_actual.char] = codigo_actual or "0"
+            return
+
+        self._generar_codigos_recursivo(nodo_actual.left, codigo_actual + "0")
+        self._generar_codigos_recursivo(nodo_actual.right, codigo_actual + "1")
+
+    def _generar_codigos_completos(self):
+        self.codigos = {}
+        self._generar_codigos_recursivo(self.arbol, "")
+        longitudes = {char: len(codigo) for char, codigo in self.codigos.items()}
+        self.codigos = self._codigos_canonicos(longitudes)
+
+    def _codigos_canonicos(self, longitudes):
+        # Con los símbolos ordenados por (longitud, símbolo) los códigos son
+        # consecutivos, así que basta con las longitudes para reconstruirlos.
+        codigos = {}
+        codigo = 0
+        longitud_previa = 0
+        for simbolo, longitud in sorted(longitudes.items(), key=lambda item: (item[1], item[0])):
+            codigo <<= longitud - longitud_previa
+            codigos[simbolo] = format(codigo, f"0{longitud}b")
+            codigo += 1
+            longitud_previa = longitud
+        return codigos
+
+    def _construir_tabla_codificacion(self):
+        simbolos = sorted(self.codigos)
+        puntos = np.array([ord(char) for char in simbolos], dtype=np.int64)
+        longitudes = np.array([len(self.codigos[char]) for char in simbolos], dtype=np.int32)
+
+        # Códigos alineados a la izquierda de una palabra de 64 bits.
+        alineados = np.array([int(self.codigos[char], 2) << (64 - len(self.codigos[char])) for char in simbolos],
+                             dtype=np.uint64)
+
+        # Cada código debe caber en una palabra de 64 bits para empaquetarlo.
+        if longitudes.max() > 64:
+            raise ValueError("Hay códigos de más de 64 bits; no se pueden empaquetar.")
+
+        # Índice del símbolo para cada punto de código (-1 si no tiene código).
+        indices = np.full(puntos[-1] + 1, -1, dtype=np.int32)
+        indices[puntos] = np.arange(len(simbolos), dtype=np.int32)
+
+        self._tabla_codificacion = (self.codigos, indices, longitudes, alineados)
+
+    def _codificar_puntos(self, puntos, bit_inicial=0):
+        # Codifica un array de puntos de código (o de bytes) empezando en el
+        # bit `bit_inicial` del primer byte; devuelve los bytes y el total de
+        # bits ocupados contando ese desplazamiento inicial.
+        if getattr(self, '_tabla_codificacion', (None,))[0] is not self.codigos:
+            self._construir_tabla_codificacion()
+        _, indices, longitudes, alineados = self._tabla_codificacion
+
+        if not puntos.size:
+            return bytearray(), bit_inicial
+        if puntos.max() >= len(indices):
+            raise ValueError("El texto contiene símbolos sin código asignado.")
+        simbolos = indices[puntos]
+        if simbolos.min() < 0:
+            raise ValueError("El texto contiene símbolos sin código asignado.")
+
+        # Posición de bit de cada símbolo = suma acumulada de las longitudes
+        # previas. Cada código cae en la palabra de 64 bits donde empieza y lo
+        # que no cabe pasa a la siguiente (desplazar 64 bits en NumPy da 0).
+        longitudes_texto = longitudes[simbolos]
+        inicios = np.cumsum(longitudes_texto, dtype=np.int64)
+        total_bits = int(inicios[-1]) + bit_inicial
+        inicios -= longitudes_texto - bit_inicial
+
+        palabra = inicios >> 6
+        desplazamiento = (inicios & 63).astype(np.uint8)
+        alineados_texto = alineados[simbolos]
+        altos = alineados_texto >> desplazamiento
+        bajos = alineados_texto << (np.uint8(64) - desplazamiento)
+
+        # Los bits de símbolos distintos no se solapan, así que sumar los
+        # valores de una misma palabra equivale a combinarlos con OR.
+        primeros = np.flatnonzero(np.concatenate(([True], palabra[1:] != palabra[:-1])))
+        grupos = palabra[primeros]
+        palabras = np.zeros((total_bits + 63) // 64 + 1, dtype=np.uint64)
+        palabras[grupos] = np.add.reduceat(altos, primeros)
+        palabras[grupos + 1] += np.add.reduceat(bajos, primeros)
+
+        return bytearray(palabras.astype('>u8').tobytes()[:(total_bits + 7) // 8]), total_bits
+
+    def _codificar_bloque(self, texto):
+        puntos = np.frombuffer(texto.encode('utf-32-le'), dtype='<u4')
+        datos, total_bits = self._codificar_puntos(puntos)
+        return datos, (8 - total_bits % 8) % 8
+
+    def _serializar_tabla(self):
+        simbolos = sorted(self.codigos, key=lambda char: (len(self.codigos[char]), char))
+        longitud_maxima = len(self.codigos[simbolos[-1]])
+
+        conteos = [0] * longitud_maxima
+        for char in simbolos:
+            conteos[len(self.codigos[char]) - 1] += 1
+
+        simbolos_bytes = self._texto_vacio(self.codigos).join(simbolos)
+        if isinstance(simbolos_bytes, str):
+            simbolos_bytes = simbolos_bytes.encode('utf-8')
+
+        return (struct.pack('<H', longitud_maxima)
+                + struct.pack(f'<{longitud_maxima}I', *conteos)
+                + struct.pack('<I', len(simbolos_bytes))
+                + simbolos_bytes)
+
+    def _serializar_cabecera(self, version=VERSION_CANONICA):
+        return struct.pack('<4sB', MAGIA_ZIPHUFF, version) + self._serializar_tabla()
+
+    def _leer_tabla(self, f, binario=False):
+        longitud_maxima = struct.unpack('<H', f.read(2))[0]
+        conteos = struct.unpack(f'<{longitud_maxima}I', f.read(4 * longitud_maxima))
+        simbolos_len = struct.unpack('<I', f.read(4))[0]
+        simbolos = f.read(simbolos_len)
+        if not binario:
+            simbolos = simbolos.decode('utf-8')
+
+        # Se rebanan los símbolos (en vez de iterarlos) para que en modo
+        # binario sigan siendo bytes de longitud 1 y no enteros.
+        longitudes = {}
+        posicion = 0
+        for longitud, conteo in enumerate(conteos, start=1):
+            for i in range(posicion, posicion + conteo):
+                longitudes[simbolos[i:i + 1]] = longitud
+            posicion += conteo
+
+        return self._codigos_canonicos(longitudes)
+
+    def _leer_cabecera(self, f):
+        firma = f.read(4)
+        if firma != MAGIA_ZIPHUFF:
+            header_len = struct.unpack('I', firma)[0]
+            header_json = f.read(header_len).decode('utf-8')
+            return VERSION_JSON, json.loads(header_json)
+
+        version = f.read(1)[0]
+        if version == VERSION_COLUMNAS:
+            return version, None
+        if version not in (VERSION_CANONICA, VERSION_BLOQUES, VERSION_BYTES):
+            raise ValueError(f"Versión de .ziphuff no soportada: {version}")
+
+        return version, self._leer_tabla(f, binario=version == VERSION_BYTES)
+
+    def _leer_fragmentos(self, entrada, tamano_fragmento):
+        fragmento = entrada.read(tamano_fragmento)
+        while fragmento:
+            yield fragmento
+            fragmento = entrada.read(tamano_fragmento)
+
+    def _preparar_codigos(self, entrada, tamano_fragmento, ejecutor=None):
+        if not entrada.seekable():
+            raise ValueError("La entrada debe permitir seek para recorrerla dos veces.")
+        inicio = entrada.tell()
+
+        frecuencias = Counter()
+        tareas = ((fragmento,) for fragmento in self._leer_fragmentos(entrada, tamano_fragmento))
+        for conteo in self._mapear(ejecutor, _contar_frecuencias, tareas):
+            frecuencias.update(conteo)
+
+        if not frecuencias:
+            raise ValueError("El archivo está vacío.")
+
+        self._construir_arbol(frecuencias)
+
+        self._generar_codigos_completos()
+
+        self._frecuencias = frecuencias
+        entrada.seek(inicio)
+        return inicio
+
+    def compress_stream(self, entrada, salida, tamano_fragmento=TAMANO_FRAGMENTO):
+        # Dos pasadas sobre `entrada` (archivo de texto con seek): la primera
+        # cuenta frecuencias y la segunda codifica fragmento a fragmento.
+        with self._ejecutor() as ejecutor:
+            self._preparar_codigos(entrada, tamano_fragmento, ejecutor)
+            frecuencias = self._frecuencias
+
+            # El total de bits se conoce desde las frecuencias, así que el byte
+            # de padding puede escribirse antes de los datos.
+            total_bits = sum(freq * len(self.codigos[char]) for char, freq in frecuencias.items())
+            padding = (8 - total_bits % 8) % 8
+
+            salida.write(self._serializar_cabecera())
+            salida.write(bytes([padding]))
+
+            # Cada fragmento se codifica por separado (posiblemente en otro
+            # proceso) y aquí se concatenan sus bits arrastrando los que no
+            # completan un byte.
+            acumulado = 0
+            bits_acumulados = 0
+            tareas = ((self.codigos, fragmento) for fragmento in self._leer_fragmentos(entrada, tamano_fragmento))
+            for datos, padding_fragmento in self._mapear(ejecutor, _codificar_texto, tareas):
+                num_bits = 8 * len(datos) - padding_fragmento
+                acumulado = (acumulado << num_bits) | (int.from_bytes(datos, 'big') >> padding_fragmento)
+                bits_acumulados += num_bits
+
+                sobrantes = bits_acumulados % 8
+                salida.write((acumulado >> sobrantes).to_bytes(bits_acumulados // 8, 'big'))
+                acumulado &= (1 << sobrantes) - 1
+                bits_acumulados = sobrantes
+
+        if bits_acumulados:
+            salida.write(bytes([acumulado << padding]))
+
+        return self.codigos
+
+    def compress(self, ruta_archivo):
+        ruta_salida = ruta_archivo + ".ziphuff"
+        
+        try:
+            with open(ruta_archivo, 'r', encoding='utf-8') as f_in, open(ruta_salida, 'wb') as f_out:
+                self.compress_stream(f_in, f_out)
+                
+            return ruta_salida, self.codigos
+
+        except Exception as e:
+            print(f"Error en compresión: {e}")
+            if os.path.exists(ruta_salida):
+                os.remove(ruta_salida)
+            return None, None
+
+    def compress_bytes(self, ruta_archivo, tamano_fragmento=TAMANO_FRAGMENTO):
+        # Modo binario: el archivo se lee a través de un mmap sin decodificar
+        # y la salida se escribe directamente en un mmap del tamaño exacto.
+        ruta_salida = ruta_archivo + ".ziphuff"
+
+        try:
+            if os.path.getsize(ruta_archivo) == 0:
+                raise ValueError("El archivo está vacío.")
+
+            # El array de NumPy es una vista sobre el mmap (sin copia); el mmap
+            # se libera junto con la vista al salir de la función.
+            with open(ruta_archivo, 'rb') as f_in:
+                entrada = mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ)
+            datos = np.frombuffer(entrada, dtype=np.uint8)
+
+            conteos = np.zeros(256, dtype=np.int64)
+            for inicio in range(0, len(datos), tamano_fragmento):
+                conteos += np.bincount(datos[inicio:inicio + tamano_fragmento], minlength=256)
+            frecuencias = {bytes([valor]): int(conteos[valor]) for valor in np.flatnonzero(conteos)}
+
+            self._construir_arbol(frecuencias)
+            self._generar_codigos_completos()
+
+            total_bits = sum(freq * len(self.codigos[simbolo]) for simbolo, freq in frecuencias.items())
+            padding = (8 - total_bits % 8) % 8
+            cabecera = self._serializar_cabecera(VERSION_BYTES) + bytes([padding])
+            tamano_salida = len(cabecera) + (total_bits + 7) // 8
+
+            with open(ruta_salida, 'w+b') as f_out:
+                f_out.truncate(tamano_salida)
+                with mmap.mmap(f_out.fileno(), tamano_salida) as salida:
+                    salida[:len(cabecera)] = cabecera
+
+                    # Cada fragmento continúa en el bit donde terminó el
+                    # anterior; su primer byte se combina con el byte parcial
+                    # ya escrito.
+                    posicion = len(cabecera)
+                    bit = 0
+                    for inicio in range(0, len(datos), tamano_fragmento):
+                        codificado, bits_fragmento = self._codificar_puntos(
+                            datos[inicio:inicio + tamano_fragmento], bit)
+                        codificado[0] |= salida[posicion]
+                        salida[posicion:posicion + len(codificado)] = codificado
+                        posicion += bits_fragmento // 8
+                        bit = bits_fragmento % 8
+
+            return ruta_salida, self.codigos
+
+        except Exception as e:
+            print(f"Error en compresión: {e}")
+            if os.path.exists(ruta_salida):
+                os.remove(ruta_salida)
+            return None, None
+
+    def _leer_filas_csv(self, entrada):
+        # Agrupa líneas hasta cerrar las comillas abiertas, para no partir
+        # un registro cuyo campo entrecomillado contiene saltos de línea.
+        fila = []
+        comillas_abiertas = False
+        for linea in entrada:
+            fila.append(linea)
+            if linea.count('"') % 2:
+                comillas_abiertas = not comillas_abiertas
+            if not comillas_abiertas:
+                yield "".join(fila)
+                fila = []
+        if fila:
+            yield "".join(fila)
+
+    def _escribir_indice(self, salida, indice, offset_indice):
+        for entrada_indice in indice:
+            salida.write(struct.pack(FORMATO_ENTRADA_INDICE, *entrada_indice))
+        salida.write(struct.pack(FORMATO_PIE, offset_indice, len(indice), MAGIA_ZIPHUFF))
+
+    def _escribir_bloques(self, ejecutor, filas, salida, filas_por_bloque, primera_fila, offset, offset_tabla):
+        # Agrupa las filas en bloques, los codifica con self.codigos y los
+        # escribe en orden; `offset` es la posición del primer bloque
+        # relativa al inicio del contenedor. Devuelve sus entradas del índice.
+        metadatos = deque()
+
+        def tareas():
+            nonlocal primera_fila
+            grupo = []
+            for fila in filas:
+                grupo.append(fila)
+                if len(grupo) < filas_por_bloque:
+                    continue
+                metadatos.append((primera_fila, len(grupo)))
+                yield self.codigos, "".join(grupo)
+                primera_fila += len(grupo)
+                grupo = []
+            if grupo:
+                metadatos.append((primera_fila, len(grupo)))
+                yield self.codigos, "".join(grupo)
+
+        indice = []
+        for datos, padding in self._mapear(ejecutor, _codificar_texto, tareas()):
+            bloque_primera_fila, num_filas = metadatos.popleft()
+            salida.write(datos)
+            indice.append(EntradaIndice(offset, len(datos), padding, bloque_primera_fila, num_filas, offset_tabla))
+            offset += len(datos)
+
+        return indice
+
+    def compress_blocks_stream(self, entrada, salida, filas_por_bloque=FILAS_POR_BLOQUE,
+                               tamano_fragmento=TAMANO_FRAGMENTO):
+        # Igual que compress_stream, pero cada bloque de `filas_por_bloque`
+        # filas del CSV se codifica por separado y se registra en el índice.
+        with self._ejecutor() as ejecutor:
+            self._preparar_codigos(entrada, tamano_fragmento, ejecutor)
+
+            inicio_salida = salida.tell()
+            cabecera = self._serializar_cabecera(VERSION_BLOQUES)
+            salida.write(cabecera)
+
+            indice = self._escribir_bloques(ejecutor, self._leer_filas_csv(entrada), salida,
+                                            filas_por_bloque, 0, len(cabecera), 5)
+
+        self._escribir_indice(salida, indice, salida.tell() - inicio_salida)
+        return indice
+
+    def compress_blocks(self, ruta_archivo, filas_por_bloque=FILAS_POR_BLOQUE):
+        ruta_salida = ruta_archivo + ".ziphuff"
+
+        try:
+            with open(ruta_archivo, 'r', encoding='utf-8') as f_in, open(ruta_salida, 'wb') as f_out:
+                self.compress_blocks_stream(f_in, f_out, filas_por_bloque)
+
+            return ruta_salida, self.codigos
+
+        except Exception as e:
+            print(f"Error en compresión: {e}")
+            if os.path.exists(ruta_salida):
+                os.remove(ruta_salida)
+            return None, None
+
+    def append_blocks_stream(self, entrada, archivo, filas_por_bloque=FILAS_POR_BLOQUE,
+                             reutilizar_tabla=True, tamano_fragmento=TAMANO_FRAGMENTO):
+        # Añade las filas de `entrada` como bloques nuevos al contenedor
+        # abierto en `archivo` (modo r+b). No se sobrescribe nada: los bloques
+        # nuevos, el índice y el pie van después del final actual, así que el
+        # índice y el pie anteriores siguen intactos hasta que se escribe el
+        # pie nuevo. Si el proceso muere a mitad, truncar el archivo a su largo
+        # original lo deja como estaba.
+        version, _ = self._leer_cabecera(archivo)
+        if version != VERSION_BLOQUES:
+            raise ValueError("Sólo se puede añadir a un contenedor por bloques.")
+
+        indice = self._leer_indice(archivo)
+        largo_original = archivo.seek(0, io.SEEK_END)
+
+        ultimo = indice[-1]
+        archivo.seek(ultimo.offset_tabla)
+        codigos_previos = self._leer_tabla(archivo)
+
+        primer_bloque = list(self._leer_bloques(archivo, [indice[0]]))[0]
+        cabecera = next(self._leer_filas_csv(io.StringIO(primer_bloque)))
+
+        with self._ejecutor() as ejecutor:
+            self._preparar_codigos(entrada, tamano_fragmento, ejecutor)
+
+            # Si la exportación nueva repite la cabecera del CSV se omite.
+            filas = self._leer_filas_csv(entrada)
+            primera = next(filas)
+            if primera != cabecera:
+                filas = chain([primera], filas)
+
+            archivo.seek(largo_original)
+            offset = largo_original
+
+            # La tabla del último segmento se reutiliza si cubre todos los
+            # símbolos nuevos; si no, el segmento nuevo lleva su propia tabla.
+            if reutilizar_tabla and set(self._frecuencias) <= set(codigos_previos):
+                self.codigos = codigos_previos
+                offset_tabla = ultimo.offset_tabla
+            else:
+                tabla = self._serializar_tabla()
+                archivo.write(tabla)
+                offset_tabla = offset
+                offset += len(tabla)
+
+            try:
+                nuevos = self._escribir_bloques(ejecutor, filas, archivo, filas_por_bloque,
+                                                ultimo.primera_fila + ultimo.num_filas, offset, offset_tabla)
+                self._escribir_indice(archivo, indice + nuevos, archivo.tell())
+                archivo.truncate()
+            except BaseException:
+                # Se deja el archivo como estaba, con su índice y pie originales.
+                archivo.truncate(largo_original)
+                raise
+
+        return nuevos
+
+    def append_blocks(self, ruta_archivo_comprimido, ruta_archivo, filas_por_bloque=FILAS_POR_BLOQUE,
+                      reutilizar_tabla=True):
+        try:
+            with open(ruta_archivo, 'r', encoding='utf-8') as f_in, open(ruta_archivo_comprimido, 'r+b') as f_out:
+                return self.append_blocks_stream(f_in, f_out, filas_por_bloque, reutilizar_tabla)
+
+        except Exception as e:
+            print(f"Error al añadir bloques: {e}")
+            return None
+
+    def _construir_tabla_decodificacion(self, codigos):
+        # Trie de los códigos: cada nodo interno es [hijo_0, hijo_1], donde un
+        # hijo es el índice de otro nodo interno o el símbolo de una hoja.
+        nodos = [[None, None]]
+        for simbolo, codigo in codigos.items():
+            actual = 0
+            for bit in codigo[:-1]:
+                siguiente = nodos[actual][bit == "1"]
+                if siguiente is None:
+                    siguiente = len(nodos)
+                    nodos.append([None, None])
+                    nodos[actual][bit == "1"] = siguiente
+                actual = siguiente
+            nodos[actual][codigo[-1] == "1"] = simbolo
+
+        # Un estado extra para secuencias de bits que no corresponden a ningún
+        # código; una vez alcanzado ya no se sale de él.
+        estado_error = len(nodos)
+        vacio = self._texto_vacio(codigos)
+
+        def avanzar(estado, valor, num_bits):
+            salida = []
+            for desplazamiento in range(num_bits - 1, -1, -1):
+                if estado == estado_error:
+                    break
+                hijo = nodos[estado][(valor >> desplazamiento) & 1]
+                if hijo is None:
+                    estado = estado_error
+                elif isinstance(hijo, int):
+                    estado = hijo
+                else:
+                    salida.append(hijo)
+                    estado = 0
+            return vacio.join(salida), estado
+
+        # Se resuelve primero cada nibble y luego se combinan dos nibbles por
+        # byte, en lugar de recorrer los 8 bits para cada par (estado, byte).
+        nibbles = [[avanzar(estado, valor, 4) for valor in range(16)]
+                   for estado in range(estado_error)]
+        nibbles.append([(vacio, estado_error)] * 16)
+
+        filas = [[None] * 256 for _ in range(estado_error + 1)]
+        for estado in range(estado_error + 1):
+            fila = filas[estado]
+            for alto in range(16):
+                texto_alto, intermedio = nibbles[estado][alto]
+                for bajo, (texto_bajo, final) in enumerate(nibbles[intermedio]):
+                    fila[(alto << 4) | bajo] = (texto_alto + texto_bajo, filas[final])
+
+        return filas, avanzar, estado_error
+
+    def _texto_vacio(self, codigos):
+        for simbolo in codigos:
+            return simbolo[:0]
+        return ""
+
+    def _decodificar_fragmento(self, datos, fila):
+        # Cada paso consume un byte completo: la fila del estado actual da
+        # directamente el texto emitido y la fila del estado siguiente.
+        partes = []
+        agregar = partes.append
+        for byte in datos:
+            texto, fila = fila[byte]
+            agregar(texto)
+        return partes, fila
+
+    def _decodificar_ultimo_byte(self, byte, padding, fila, tabla):
+        # El último byte puede llevar bits de relleno que no se decodifican.
+        filas, avanzar, estado_error = tabla
+        estado = next(i for i, f in enumerate(filas) if f is fila)
+        texto, estado = avanzar(estado, byte >> padding, 8 - padding)
+
+        if estado == estado_error:
+            raise ValueError("Los datos comprimidos no corresponden a la tabla de códigos.")
+
+        return texto
+
+    def _decodificar_datos(self, datos, padding, tabla, vacio):
+        if not datos:
+            return vacio
+
+        partes, fila = self._decodificar_fragmento(memoryview(datos)[:-1], tabla[0][0])
+        partes.append(self._decodificar_ultimo_byte(datos[-1], padding, fila, tabla))
+
+        return vacio.join(partes)
+
+    def _leer_indice(self, f, inicio=0):
+        f.seek(-struct.calcsize(FORMATO_PIE), io.SEEK_END)
+        offset_indice, num_bloques, firma = struct.unpack(FORMATO_PIE, f.read(struct.calcsize(FORMATO_PIE)))
+        if firma != MAGIA_ZIPHUFF:
+            raise ValueError("El archivo no contiene un índice de bloques válido.")
+
+        f.seek(inicio + offset_indice)
+        tamano_entrada = struct.calcsize(FORMATO_ENTRADA_INDICE)
+        datos_indice = f.read(tamano_entrada * num_bloques)
+        return [EntradaIndice(*campos) for campos in struct.iter_unpack(FORMATO_ENTRADA_INDICE, datos_indice)]
+
+    def _leer_bloques(self, f, bloques, inicio=0):
+        # Los bloques se leen en orden y se decodifican, en paralelo si hay
+        # varios workers; cada tabla de códigos se lee del archivo una vez.
+        codigos_por_offset = {}
+
+        def tareas():
+            for bloque in bloques:
+                if bloque.offset_tabla not in codigos_por_offset:
+                    f.seek(inicio + bloque.offset_tabla)
+                    codigos_por_offset[bloque.offset_tabla] = self._leer_tabla(f)
+                f.seek(inicio + bloque.offset)
+                yield codigos_por_offset[bloque.offset_tabla], f.read(bloque.longitud), bloque.padding
+
+        with self._ejecutor() as ejecutor:
+            yield from self._mapear(ejecutor, _decodificar_bloque, tareas())
+
+    def _indice_de_bloques(self, f, ruta_archivo_comprimido):
+        # El índice del contenedor por bloques; con otro formato se avisa
+        # cuál es, porque el pie del modo por columnas también parece un
+        # índice de bloques.
+        version, _ = self._leer_cabecera(f)
+        if version != VERSION_BLOQUES:
+            raise ValueError(f"'{ruta_archivo_comprimido}' no es un contenedor por bloques "
+                             f"(formato: {NOMBRES_VERSIONES.get(version, version)}).")
+        return self._leer_indice(f)
+
+    def block_index(self, ruta_archivo_comprimido):
+        with open(ruta_archivo_comprimido, 'rb') as f:
+            return self._indice_de_bloques(f, ruta_archivo_comprimido)
+
+    def read_block(self, ruta_archivo_comprimido, numero_bloque):
+        with open(ruta_archivo_comprimido, 'rb') as f:
+            indice = self._indice_de_bloques(f, ruta_archivo_comprimido)
+            return list(self._leer_bloques(f, [indice[numero_bloque]]))[0]
+
+    def read_rows(self, ruta_archivo_comprimido, inicio, fin):
+        # Filas [inicio, fin) del CSV original; la fila 0 es la cabecera.
+        # Sólo se decodifican los bloques que se solapan con el rango.
+        with open(ruta_archivo_comprimido, 'rb') as f:
+            indice = self._indice_de_bloques(f, ruta_archivo_comprimido)
+            bloques = [bloque for bloque in indice
+                       if bloque.primera_fila < fin and bloque.primera_fila + bloque.num_filas > inicio]
+
+            filas = []
+            for bloque, texto in zip(bloques, self._leer_bloques(f, bloques)):
+                for numero, fila in enumerate(self._leer_filas_csv(io.StringIO(texto)), start=bloque.primera_fila):
+                    if inicio <= numero < fin:
+                        filas.append(fila)
+
+        return "".join(filas)
+
+    def _comprimir_seccion(self, datos):
+        # Una sección es una tabla de códigos propia, el byte de padding y los
+        # datos; `datos` puede ser texto o bytes (alfabeto binario).
+        if not datos:
+            return b""
+
+        compresor = HuffmanCompressor()
+        if isinstance(datos, bytes):
+            frecuencias = {bytes([valor]): freq for valor, freq in Counter(datos).items()}
+            puntos = np.frombuffer(datos, dtype=np.uint8)
+        else:
+            frecuencias = Counter(datos)
+            puntos = np.frombuffer(datos.encode('utf-32-le'), dtype='<u4')
+
+        compresor._construir_arbol(frecuencias)
+        compresor._generar_codigos_completos()
+        codificado, total_bits = compresor._codificar_puntos(puntos)
+
+        return compresor._serializar_tabla() + bytes([(8 - total_bits % 8) % 8]) + codificado
+
+    def _descomprimir_seccion(self, datos, binario):
+        if not datos:
+            return b"" if binario else ""
+
+        f = io.BytesIO(datos)
+        codigos = self._leer_tabla(f, binario)
+        padding = f.read(1)[0]
+        if binario:
+            codigos = {simbolo.decode('latin-1'): codigo for simbolo, codigo in codigos.items()}
+
+        texto = self._decodificar_datos(f.read(), padding, self._construir_tabla_decodificacion(codigos), "")
+        return texto.encode('latin-1') if binario else texto
+
+    def _separar_columnas(self, entrada):
+        # Devuelve la cabecera tal cual, los valores de cada columna y, por
+        # fila, qué campos venían entre comillas; las filas cuyo texto no se
+        # reconstruye así se guardan literalmente como excepciones.
+        filas = self._leer_filas_csv(entrada)
+        cabecera = next(filas, "")
+        if next(csv.reader([cabecera.rstrip("\n")]), None) != COLUMNAS_CSV:
+            raise ValueError(f"El modo por columnas requiere un CSV con columnas {COLUMNAS_CSV}.")
+
+        ids, urls, titulos, comillas, excepciones = [], [], [], bytearray(), {}
+        for numero, fila in enumerate(filas):
+            campos = next(csv.reader(io.StringIO(fila, newline='')), [])
+            if len(campos) != len(COLUMNAS_CSV):
+                raise ValueError(f"La fila {numero + 1} no tiene {len(COLUMNAS_CSV)} campos.")
+            if any(SEPARADOR_VALORES in campo for campo in campos):
+                raise ValueError("El CSV contiene caracteres nulos; use el modo por bloques.")
+            try:
+                ids.append(int(campos[0]))
+            except ValueError:
+                raise ValueError(f"El id de la fila {numero + 1} no es un entero.")
+            if not -ID_MAXIMO <= ids[-1] < ID_MAXIMO:
+                raise ValueError(f"El id de la fila {numero + 1} es demasiado grande; use el modo por bloques.")
+            urls.append(campos[1])
+            titulos.append(campos[2])
+
+            mascara = self._mascara_comillas(fila, campos)
+            if mascara is None or str(ids[-1]) != campos[0]:
+                excepciones[numero] = fila
+                mascara = 0
+            comillas.append(mascara)
+
+        return cabecera, ids, urls, titulos, bytes(comillas), excepciones
+
+    def _mascara_comillas(self, fila, campos):
+        posicion = 0
+        mascara = 0
+        for j, campo in enumerate(campos):
+            separador = "," if j < len(campos) - 1 else "\n"
+            citado = '"' + campo.replace('"', '""') + '"'
+            if fila.startswith(citado + separador, posicion):
+                mascara |= 1 << j
+                posicion += len(citado) + 1
+            elif fila.startswith(campo + separador, posicion):
+                posicion += len(campo) + 1
+            else:
+                return None
+        return mascara if posicion == len(fila) else None
+
+    def _formatear_fila(self, campos, mascara):
+        partes = []
+        for j, campo in enumerate(campos):
+            if mascara & (1 << j):
+                campo = '"' + campo.replace('"', '""') + '"'
+            partes.append(campo)
+        return ",".join(partes) + "\n"
+
+    def compress_columns(self, ruta_archivo):
+        # Devuelve la ruta del .ziphuff y el tamaño en bytes de cada sección.
+        ruta_salida = ruta_archivo + ".ziphuff"
+
+        try:
+            with open(ruta_archivo, 'r', encoding='utf-8') as f_in:
+                cabecera, ids, urls, titulos, comillas, excepciones = self._separar_columnas(f_in)
+
+            if not ids:
+                raise ValueError("El CSV no tiene filas de datos.")
+
+            # ids: diferencias con el anterior en zigzag + varint.
+            deltas = [_zigzag(actual - previo) for previo, actual in zip([0] + ids, ids)]
+
+            # URLs ordenadas con codificación frontal: cada una guarda sólo el
+            # largo del prefijo que comparte con la anterior y su sufijo. El
+            # orden permite restaurar la posición original de cada fila.
+            orden = sorted(range(len(urls)), key=urls.__getitem__)
+            prefijos = []
+            sufijos = []
+            previa = ""
+            for fila in orden:
+                url = urls[fila]
+                comun = _prefijo_comun(previa, url)
+                prefijos.append(comun)
+                sufijos.append(url[comun:])
+                previa = url
+
+            secciones = {
+                'cabecera': cabecera.encode('utf-8'),
+                'ids': self._comprimir_seccion(encode_varints(deltas)[0].tobytes()),
+                'url_orden': self._comprimir_seccion(encode_varints(orden)[0].tobytes()),
+                'url_prefijos': self._comprimir_seccion(encode_varints(prefijos)[0].tobytes()),
+                'url_sufijos': self._comprimir_seccion(SEPARADOR_VALORES.join(sufijos)),
+                'titulos': self._comprimir_seccion(SEPARADOR_VALORES.join(titulos)),
+                'comillas': self._comprimir_seccion(comillas),
+                'excepciones': self._comprimir_seccion(SEPARADOR_VALORES.join(
+                    f"{numero}{SEPARADOR_VALORES}{fila}" for numero, fila in excepciones.items())),
+            }
+
+            with open(ruta_salida, 'wb') as f_out:
+                f_out.write(struct.pack('<4sB', MAGIA_ZIPHUFF, VERSION_COLUMNAS))
+                directorio = []
+                for nombre, datos in secciones.items():
+                    directorio.append((nombre.encode('ascii'), f_out.tell(), len(datos)))
+                    f_out.write(datos)
+
+                offset_directorio = f_out.tell()
+                for entrada_seccion in directorio:
+                    f_out.write(struct.pack(FORMATO_ENTRADA_SECCION, *entrada_seccion))
+                f_out.write(struct.pack(FORMATO_PIE, offset_directorio, len(directorio), MAGIA_ZIPHUFF))
+
+            return ruta_salida, {nombre: len(datos) for nombre, datos in secciones.items()}
+
+        except Exception as e:
+            print(f"Error en compresión: {e}")
+            if os.path.exists(ruta_salida):
+                os.remove(ruta_salida)
+            return None, None
+
+    def _leer_directorio(self, f, inicio=0):
+        f.seek(-struct.calcsize(FORMATO_PIE), io.SEEK_END)
+        offset_directorio, num_secciones, firma = struct.unpack(FORMATO_PIE, f.read(struct.calcsize(FORMATO_PIE)))
+        if firma != MAGIA_ZIPHUFF:
+            raise ValueError("El archivo no contiene un directorio de secciones válido.")
+
+        f.seek(inicio + offset_directorio)
+        datos = f.read(struct.calcsize(FORMATO_ENTRADA_SECCION) * num_secciones)
+        return {nombre.rstrip(b"\x00").decode('ascii'): (offset, longitud)
+                for nombre, offset, longitud in struct.iter_unpack(FORMATO_ENTRADA_SECCION, datos)}
+
+    def _leer_seccion(self, f, directorio, nombre, binario, inicio=0):
+        offset, longitud = directorio[nombre]
+        f.seek(inicio + offset)
+        return self._descomprimir_seccion(f.read(longitud), binario)
+
+    def _leer_columna(self, f, directorio, nombre, inicio=0):
+        if nombre == 'id':
+            ids = []
+            actual = 0
+            for delta in decode_varints(self._leer_seccion(f, directorio, 'ids', True, inicio)).tolist():
+                actual += _deszigzag(delta)
+                ids.append(actual)
+            return ids
+
+        if nombre == 'url':
+            orden = decode_varints(self._leer_seccion(f, directorio, 'url_orden', True, inicio)).tolist()
+            prefijos = decode_varints(self._leer_seccion(f, directorio, 'url_prefijos', True, inicio)).tolist()
+            sufijos = self._leer_seccion(f, directorio, 'url_sufijos', False, inicio).split(SEPARADOR_VALORES)
+
+            urls = [None] * len(orden)
+            previa = ""
+            for fila, comun, sufijo in zip(orden, prefijos, sufijos):
+                previa = previa[:comun] + sufijo
+                urls[fila] = previa
+            return urls
+
+        if nombre == 'title':
+            return self._leer_seccion(f, directorio, 'titulos', False, inicio).split(SEPARADOR_VALORES)
+
+        raise ValueError(f"Columna desconocida '{nombre}'; las columnas son {COLUMNAS_CSV}.")
+
+    def read_column(self, ruta_archivo_comprimido, nombre):
+        # Sólo se leen y decodifican las secciones de la columna pedida.
+        with open(ruta_archivo_comprimido, 'rb') as f:
+            version, _ = self._leer_cabecera(f)
+            if version != VERSION_COLUMNAS:
+                raise ValueError("El archivo no fue comprimido por columnas.")
+            return self._leer_columna(f, self._leer_directorio(f), nombre)
+
+    def _leer_columnas(self, f, inicio=0, filas_por_fragmento=FILAS_POR_BLOQUE):
+        directorio = self._leer_directorio(f, inicio)
+        offset, longitud = directorio['cabecera']
+        f.seek(inicio + offset)
+        cabecera = f.read(longitud).decode('utf-8')
+
+        columnas = [self._leer_columna(f, directorio, nombre, inicio) for nombre in COLUMNAS_CSV]
+        comillas = self._leer_seccion(f, directorio, 'comillas', True, inicio)
+        excepciones = self._leer_seccion(f, directorio, 'excepciones', False, inicio)
+        excepciones = excepciones.split(SEPARADOR_VALORES) if excepciones else []
+        excepciones = {int(numero): fila for numero, fila in zip(excepciones[0::2], excepciones[1::2])}
+
+        yield cabecera
+        partes = []
+        for numero, campos in enumerate(zip(*columnas)):
+            if numero in excepciones:
+                partes.append(excepciones[numero])
+            else:
+                partes.append(self._formatear_fila([str(campos[0]), campos[1], campos[2]], comillas[numero]))
+            if len(partes) >= filas_por_fragmento:
+                yield "".join(partes)
+                partes = []
+        if partes:
+            yield "".join(partes)
+
+    def decompress_stream(self, entrada, tamano_fragmento=TAMANO_FRAGMENTO):
+        # Generador sobre un archivo binario abierto: produce el texto
+        # decodificado por fragmentos sin cargar el archivo completo.
+        inicio = entrada.tell()
+        version, codigos = self._leer_cabecera(entrada)
+        if version == VERSION_BLOQUES:
+            yield from self._leer_bloques(entrada, self._leer_indice(entrada, inicio), inicio)
+            return
+        if version == VERSION_COLUMNAS:
+            yield from self._leer_columnas(entrada, inicio)
+            return
+
+        padding = entrada.read(1)[0]
+
+        # En modo binario la tabla trabaja con caracteres latin-1 (uno por
+        # byte) y se vuelve a bytes al final de cada fragmento: unir muchos
+        # str es mucho más barato en memoria que unir muchos bytes.
+        binario = version == VERSION_BYTES
+        if binario:
+            codigos = {simbolo.decode('latin-1'): codigo for simbolo, codigo in codigos.items()}
+
+        tabla = self._construir_tabla_decodificacion(codigos)
+        fila = tabla[0][0]
+
+        fragmento = entrada.read(tamano_fragmento)
+        while fragmento:
+            siguiente = entrada.read(tamano_fragmento)
+            if siguiente:
+                partes, fila = self._decodificar_fragmento(fragmento, fila)
+            else:
+                partes, fila = self._decodificar_fragmento(memoryview(fragmento)[:-1], fila)
+                partes.append(self._decodificar_ultimo_byte(fragmento[-1], padding, fila, tabla))
+            texto = "".join(partes)
+            yield texto.encode('latin-1') if binario else texto
+            fragmento = siguiente
+
+    def decompress_to_string(self, ruta_archivo_comprimido):
+        with open(ruta_archivo_comprimido, 'rb') as f:
+            version, _ = self._leer_cabecera(f)
+            if version == VERSION_BYTES:
+                raise ValueError(f"'{ruta_archivo_comprimido}' es un archivo binario (modo bytes): "
+                                 "use decompress_stream o decompress.")
+            f.seek(0)
+            return "".join(self.decompress_stream(f))
+
+    def _lineas(self, fragmentos):
+        # Líneas completas (con su "\n") de una secuencia de fragmentos de
+        # texto; la línea cortada al final de un fragmento sigue en el otro.
+        resto = ""
+        for fragmento in fragmentos:
+            lineas = (resto + fragmento).split("\n")
+            resto = lineas.pop()
+            for linea in lineas:
+                yield linea + "\n"
+        if resto:
+            yield resto
+
+    def read_records(self, ruta_archivo_comprimido, columnas=COLUMNAS_CSV):
+        # Generador de las filas de un CSV comprimido como tuplas con los
+        # campos `columnas` en ese orden. Las filas se parsean a medida que se
+        # decodifica, sin armar el texto completo; en el modo por columnas se
+        # leen directamente las secciones pedidas.
+        with open(ruta_archivo_comprimido, 'rb') as f:
+            version, _ = self._leer_cabecera(f)
+            if version == VERSION_COLUMNAS:
+                directorio = self._leer_directorio(f)
+                valores = {nombre: self._leer_columna(f, directorio, nombre) for nombre in set(columnas)}
+                if 'id' in valores:
+                    valores['id'] = [str(csv_id) for csv_id in valores['id']]
+                yield from zip(*(valores[nombre] for nombre in columnas))
+                return
+
+            f.seek(0)
+            fragmentos = self.decompress_stream(f)
+            if version == VERSION_BYTES:
+                decodificador = codecs.getincrementaldecoder('utf-8')()
+                fragmentos = (decodificador.decode(fragmento) for fragmento in fragmentos)
+
+            filas = csv.reader(self._lineas(fragmentos))
+            cabecera = next(filas, None)
+            if cabecera is None:
+                return
+            faltantes = [nombre for nombre in columnas if nombre not in cabecera]
+            if faltantes:
+                raise ValueError(f"El CSV no tiene las columnas {faltantes}.")
+            posiciones = [cabecera.index(nombre) for nombre in columnas]
+
+            for campos in filas:
+                if len(campos) == len(cabecera):
+                    yield tuple(campos[posicion] for posicion in posiciones)
+
+    def decompress(self, ruta_archivo_comprimido):
+        ruta_salida = ruta_archivo_comprimido.replace(".ziphuff", "_descomprimido.txt")
+        
+        try:
+            with open(ruta_archivo_comprimido, 'rb') as f_in:
+                fragmentos = self.decompress_stream(f_in)
+                primero = next(fragmentos, "")
+
+                # Los archivos del modo binario se restauran byte a byte.
+                if isinstance(primero, bytes):
+                    f_out = open(ruta_salida, 'wb')
+                else:
+                    f_out = open(ruta_salida, 'w', encoding='utf-8')
+
+                with f_out:
+                    f_out.write(primero)
+                    for texto in fragmentos:
+                        f_out.write(texto)
+                
+            return ruta_salida
+            
+        except Exception as e:
+            print(f"Error en descompresión: {e}")
+            return None